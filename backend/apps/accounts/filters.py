@@ -0,0 +1,53 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connections
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from rest_framework import filters
+
+
+class ProfileSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter over the weighted search vector the database keeps on
+    Profile: every term must prefix match a lexeme, names and email ranking
+    above phone and zip code, and those above the address. Names also match
+    by trigram similarity, catching typos. Results come ranked unless an
+    ordering is requested.
+
+    Every predicate reads a Profile column, so the lookups combine in one
+    bitmap scan over GIN indexes; the email is matched through the vector,
+    a predicate on the joined User table would scan every row. This
+    replaces the icontains scan over the view's search_fields, which is
+    kept for databases other than PostgreSQL.
+    """
+    search_config = 'public.portuguese_unaccent'
+    search_vector_field = 'profile__search_vector'
+    trigram_fields = ('profile__first_name', 'profile__last_name')
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms or connections[queryset.db].vendor != 'postgresql':
+            return super().filter_queryset(request, queryset, view)
+
+        query = SearchQuery(self.get_tsquery(terms), config=self.search_config, search_type='raw')
+        text = ' '.join(terms)
+
+        matches = Q(**{self.search_vector_field: query})
+        for field in self.trigram_fields:
+            matches |= Q(**{f"{field}__trigram_similar": text})
+
+        rank = SearchRank(F(self.search_vector_field), query) + Greatest(
+            *[TrigramSimilarity(field, text) for field in self.trigram_fields]
+        )
+        ordering = queryset.query.order_by or (queryset.model._meta.pk.name,)
+        return queryset.alias(search_rank=rank).filter(matches).order_by('-search_rank', *ordering)
+
+    def get_tsquery(self, terms):
+        """
+        Returns the terms as a prefix match on all of them, e.g.
+        "'joao':* & 'silv':*", quoted so they are never read as operators.
+        """
+        quoted = []
+        for term in terms:
+            term = term.replace('\\', '\\\\').replace("'", "''")
+            quoted.append(f"'{term}':*")
+        return ' & '.join(quoted)
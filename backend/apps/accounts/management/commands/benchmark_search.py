@@ -0,0 +1,146 @@
+import time
+
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework import filters
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from apps.accounts.filters import ProfileSearchFilter
+from apps.accounts.models import User
+from apps.accounts.pagination import AccountPagination
+from apps.accounts.views import UserProfileViewSet
+
+BENCHMARK_DOMAIN = 'benchmark.invalid'
+
+FIRST_NAMES = ['João', 'José', 'Maria', 'Ana', 'Antônio', 'Francisco', 'Luíza', 'Márcia', 'Sebastião', 'Conceição']
+LAST_NAMES = ['Silva', 'Souza', 'Araújo', 'Gonçalves', 'Conceição', 'Assunção', 'Pereira', 'Simões', 'Brandão', 'Lima']
+NEIGHBORHOODS = ['Centro', 'Lagoa Nova', 'Petrópolis', 'Tirol', 'Candelária', 'Ponta Negra', 'Alecrim']
+
+# The user's email is read by the trigger filling the profile's search vector.
+SEED_USERS_SQL = """
+INSERT INTO accounts_user (uuid, password, is_superuser, first_name, last_name, is_staff, is_active,
+                           date_joined, email, username)
+SELECT md5('benchmark' || i)::uuid, '!', false, '', '', false, true, now(),
+       'user' || i || '@' || %(domain)s, ''
+FROM generate_series(%(start)s, %(stop)s) AS i
+"""
+
+SEED_PROFILES_SQL = """
+INSERT INTO accounts_profile (user_id, first_name, last_name, phone_number, is_admin, address, number,
+                              neighborhood, zip_code)
+SELECT md5('benchmark' || i)::uuid,
+       (%(first_names)s::text[])[1 + i %% array_length(%(first_names)s::text[], 1)],
+       (%(last_names)s::text[])[1 + (i / 7) %% array_length(%(last_names)s::text[], 1)],
+       '(' || (11 + i %% 89) || ') 9' || lpad((i %% 10000)::text, 4, '0') || '-' || lpad((i * 7 %% 10000)::text, 4, '0'),
+       i %% 100 = 0,
+       'Rua ' || (%(last_names)s::text[])[1 + (i / 3) %% array_length(%(last_names)s::text[], 1)],
+       (i %% 2000)::text,
+       (%(neighborhoods)s::text[])[1 + i %% array_length(%(neighborhoods)s::text[], 1)],
+       lpad((59000000 + i %% 100000)::text, 8, '0')
+FROM generate_series(%(start)s, %(stop)s) AS i
+"""
+
+DELETE_PROFILES_SQL = """
+DELETE FROM accounts_profile
+WHERE user_id IN (SELECT uuid FROM accounts_user WHERE email LIKE '%%@' || %(domain)s)
+"""
+
+DELETE_USERS_SQL = """
+DELETE FROM accounts_user WHERE email LIKE '%%@' || %(domain)s
+"""
+
+
+class Command(BaseCommand):
+    help = 'Measures the user search, icontains over search_fields versus the search vector'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000000,
+                            help='Users to search, synthetic ones are added up to this count')
+        parser.add_argument('--batch', type=int, default=100000,
+                            help='Synthetic users inserted per statement')
+        parser.add_argument('--seconds', type=float, default=5.0,
+                            help='Duration of each measurement')
+        parser.add_argument('--term', action='append', dest='terms',
+                            help='Search to measure, may be repeated')
+        parser.add_argument('--explain', action='store_true',
+                            help='Print the plan of the search vector queries')
+        parser.add_argument('--cleanup', action='store_true',
+                            help='Delete the synthetic users afterwards')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('The search vector requires PostgreSQL')
+
+        self.seed(options['users'], options['batch'])
+        total = User.objects.count()
+        terms = options['terms'] or ['silva', 'joao', 'maria souza', 'conceicao', 'gonsalves', '59001', 'user4242@']
+        self.stdout.write(f"{total:,} users, {options['seconds']}s per measurement\n")
+
+        queryset = UserProfileViewSet.queryset
+        before = filters.SearchFilter()
+        after = ProfileSearchFilter()
+        # The search_fields the view had before, the boolean included.
+        view = SimpleNamespace(search_fields=UserProfileViewSet.search_fields + ['profile__is_admin'])
+        page_size = AccountPagination.page_size
+
+        self.stdout.write(f"{'search':<16} {'icontains (before)':>20} {'search vector (after)':>22} {'matches':>10}")
+        for term in terms:
+            request = Request(APIRequestFactory().get('/', {'search': term}))
+            old = before.filter_queryset(request, queryset, view)
+            new = after.filter_queryset(request, queryset, view)
+
+            old_ms = self.measure(old, page_size, options['seconds'])
+            new_ms = self.measure(new, page_size, options['seconds'])
+            self.stdout.write(f"{term:<16} {old_ms:>17,.1f} ms {new_ms:>19,.1f} ms {new.count():>10,}")
+
+            if options['explain']:
+                self.stdout.write(new[:page_size].explain(analyze=True))
+
+        if options['cleanup']:
+            # Plain DELETEs, QuerySet.delete() would load every row first.
+            with connection.cursor() as cursor:
+                cursor.execute(DELETE_PROFILES_SQL, {'domain': BENCHMARK_DOMAIN})
+                cursor.execute(DELETE_USERS_SQL, {'domain': BENCHMARK_DOMAIN})
+                deleted = cursor.rowcount
+            self.stdout.write(f"\nDeleted {deleted:,} synthetic users")
+
+    def seed(self, users, batch):
+        missing = users - User.objects.count()
+        if missing <= 0:
+            return
+
+        start = User.objects.filter(email__endswith=f'@{BENCHMARK_DOMAIN}').count() + 1
+        stop = start + missing - 1
+        self.stdout.write(f"Adding {missing:,} synthetic users (@{BENCHMARK_DOMAIN})...")
+
+        with connection.cursor() as cursor:
+            for first in range(start, stop + 1, batch):
+                params = {
+                    'domain': BENCHMARK_DOMAIN,
+                    'start': first,
+                    'stop': min(first + batch - 1, stop),
+                    'first_names': FIRST_NAMES,
+                    'last_names': LAST_NAMES,
+                    'neighborhoods': NEIGHBORHOODS,
+                }
+                cursor.execute(SEED_USERS_SQL, params)
+                cursor.execute(SEED_PROFILES_SQL, params)
+            cursor.execute('ANALYZE accounts_user')
+            cursor.execute('ANALYZE accounts_profile')
+
+    def measure(self, queryset, page_size, seconds):
+        """
+        Returns the mean milliseconds to serve a page: the count the
+        paginator runs plus the page itself.
+        """
+        count = 0
+        start = time.perf_counter()
+        deadline = start + seconds
+        while count == 0 or time.perf_counter() < deadline:
+            queryset.count()
+            list(queryset[:page_size])
+            count += 1
+        return (time.perf_counter() - start) * 1000 / count
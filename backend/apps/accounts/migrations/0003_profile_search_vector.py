@@ -0,0 +1,105 @@
+# Generated by Django 3.2 on 2026-10-18 16:20
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension, UnaccentExtension
+from django.db import migrations
+
+# Portuguese stemming over unaccented words, so "João" and "joao" share
+# one lexeme.
+SEARCH_CONFIG_SQL = """
+CREATE TEXT SEARCH CONFIGURATION public.portuguese_unaccent (COPY = pg_catalog.portuguese);
+ALTER TEXT SEARCH CONFIGURATION public.portuguese_unaccent
+    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+"""
+
+REVERSE_SEARCH_CONFIG_SQL = """
+DROP TEXT SEARCH CONFIGURATION IF EXISTS public.portuguese_unaccent;
+"""
+
+# Weights: A names and email, B phone and zip code, C address. The email
+# is indexed whole and split on its separators, phone and zip code as
+# typed and as digits only, so partial terms match.
+SEARCH_VECTOR_SQL = """
+CREATE FUNCTION accounts_profile_search_vector(profile accounts_profile) RETURNS tsvector AS $$
+    SELECT
+        setweight(to_tsvector('public.portuguese_unaccent',
+            concat_ws(' ', profile.first_name, profile.last_name)), 'A') ||
+        setweight(to_tsvector('simple', coalesce((
+            SELECT email || ' ' || translate(email, '@.-_+', '     ')
+            FROM accounts_user WHERE uuid = profile.user_id
+        ), '')), 'A') ||
+        setweight(to_tsvector('simple', concat_ws(' ',
+            profile.phone_number, regexp_replace(profile.phone_number, '\\D', '', 'g'),
+            profile.zip_code, regexp_replace(profile.zip_code, '\\D', '', 'g'))), 'B') ||
+        setweight(to_tsvector('public.portuguese_unaccent', concat_ws(' ',
+            profile.address, profile.number, profile.neighborhood, profile.complement)), 'C')
+$$ LANGUAGE sql STABLE;
+
+CREATE FUNCTION accounts_profile_search_vector_trigger() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := accounts_profile_search_vector(NEW);
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER accounts_profile_search_vector_update
+    BEFORE INSERT OR UPDATE OF user_id, first_name, last_name, phone_number, address, number,
+        neighborhood, complement, zip_code
+    ON accounts_profile
+    FOR EACH ROW EXECUTE PROCEDURE accounts_profile_search_vector_trigger();
+
+CREATE FUNCTION accounts_user_search_vector_trigger() RETURNS trigger AS $$
+BEGIN
+    UPDATE accounts_profile SET search_vector = accounts_profile_search_vector(accounts_profile)
+    WHERE user_id = NEW.uuid;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER accounts_user_search_vector_update
+    AFTER UPDATE OF email ON accounts_user
+    FOR EACH ROW WHEN (OLD.email IS DISTINCT FROM NEW.email)
+    EXECUTE PROCEDURE accounts_user_search_vector_trigger();
+
+UPDATE accounts_profile SET search_vector = accounts_profile_search_vector(accounts_profile);
+"""
+
+REVERSE_SEARCH_VECTOR_SQL = """
+DROP TRIGGER IF EXISTS accounts_user_search_vector_update ON accounts_user;
+DROP FUNCTION IF EXISTS accounts_user_search_vector_trigger();
+DROP TRIGGER IF EXISTS accounts_profile_search_vector_update ON accounts_profile;
+DROP FUNCTION IF EXISTS accounts_profile_search_vector_trigger();
+DROP FUNCTION IF EXISTS accounts_profile_search_vector(accounts_profile);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_auto_20250916_1819'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        UnaccentExtension(),
+        migrations.RunSQL(SEARCH_CONFIG_SQL, REVERSE_SEARCH_CONFIG_SQL),
+        migrations.AddField(
+            model_name='profile',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(SEARCH_VECTOR_SQL, REVERSE_SEARCH_VECTOR_SQL),
+        migrations.AddIndex(
+            model_name='profile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='accounts_profile_search'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['first_name'], name='accounts_profile_first_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['last_name'], name='accounts_profile_last_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
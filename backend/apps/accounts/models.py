@@ -1,15 +1,21 @@
 import uuid
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import RegexValidator
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db import transaction
 from django.utils.translation import ugettext_lazy as _
 from django.db.models.signals import post_save
+from django.db.models.signals import post_delete
 from django.dispatch import receiver
 from rest_framework.authtoken.models import Token
 from apps.utils.phone_validator import phone_regex
+from apps.utils.cache import cache_method, invalidate_cached_method
 from apps.address.models import AddressType, City, State, Country
+from apps.permission.matrix import FULL_MATRIX, EMPTY_MATRIX, PERMISSION_CACHE_TIMEOUT
 from .managers import UserManager  # Import the UserManager from managers.py
 
 class User(AbstractUser):
@@ -21,6 +27,13 @@ class User(AbstractUser):
     REQUIRED_FIELDS = []
     objects = UserManager()  # Use the imported UserManager
 
+    @cache_method(timeout=PERMISSION_CACHE_TIMEOUT, tags=lambda self: [f'profile.{self.pk}'])
+    def get_profile(self):
+        """
+        Returns the profile, with its permission profile, or None.
+        """
+        return Profile.objects.select_related('permission').filter(user_id=self.pk).first()
+
     class Meta:
         indexes = [
             models.Index(fields=['uuid']),
@@ -56,6 +69,8 @@ class Profile(models.Model):
     state = models.ForeignKey(State, on_delete=models.PROTECT, blank=True, null=True)
     country = models.ForeignKey(Country, on_delete=models.PROTECT, blank=True, null=True)
     zip_code = models.CharField(verbose_name="CEP", max_length=50, blank=True, null=True)
+    # Kept up to date by database triggers (migration 0003), see filters.py.
+    search_vector = SearchVectorField(null=True, editable=False)
 
     def __str__(self):
         return f'{self.user.email}'
@@ -63,46 +78,28 @@ class Profile(models.Model):
     def get_full_name(self):
         return f"{self.first_name} {self.last_name}"
 
+    def has_full_permission(self):
+        return self.user.is_superuser or self.user.is_staff or self.is_admin
+
+    def get_permission_matrix(self):
+        if self.has_full_permission():
+            return FULL_MATRIX
+        if self.permission_id is None:
+            return EMPTY_MATRIX
+        return self.permission.get_matrix()
+
     def get_permission_for_app(self, app, action):
-        if self.user.is_superuser or self.user.is_staff or self.is_admin:
-            return True
-        if self.permission:
-            permission = self.permission.options.filter(app_option=app).first()
-            if permission:
-                return getattr(permission, action, False)
-        return False
+        return self.get_permission_matrix().has(app, action)
 
     def get_permissions_for_modules(self):
-        MODULES = (
-            ('user', 'User'),
-            ('permission', 'Permission'),
-            ('company', 'Company'),
-            ('checklist', 'Checklist'),
-            ('order', 'Order'),
-            ('order_settings', 'OrderSettings'),
-            ('partner', 'Partner'),
-            ('partner_settings', 'PartnerSettings'),
-            ('stock', 'Stock'),
-            ('stock_settings', 'StockSettings'),
-            ('product', 'Product'),
-            ('product_settings', 'ProductSettings'),
-            ('supplier', 'Supplier'),
-            ('report', 'Report'),
-            ('report_settings', 'ReportSettings'),
-            ('admin', 'Admin'),
-        )
-        PERMISSIONS = (
-            ('can_read', 'permission_read'),
-            ('can_edit', 'permission_update'),
-            ('can_write', 'permission_write'),
-            ('can_delete', 'permission_delete'),
-        )
-        permissions_modules = {}
-        for key, value in MODULES:
-            permissions_modules[key] = {}
-            for action, permission in PERMISSIONS:
-                permissions_modules[key][action] = self.get_permission_for_app(value, permission)
-        return permissions_modules
+        return self.get_permission_matrix().to_modules()
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='accounts_profile_search'),
+            GinIndex(fields=['first_name'], opclasses=['gin_trgm_ops'], name='accounts_profile_first_trgm'),
+            GinIndex(fields=['last_name'], opclasses=['gin_trgm_ops'], name='accounts_profile_last_trgm'),
+        ]
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -111,4 +108,9 @@ def create_user_profile(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
\ No newline at end of file
+    instance.profile.save()
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_user_profile(sender, instance, using=None, **kwargs):
+    transaction.on_commit(lambda: invalidate_cached_method(f'profile.{instance.user_id}'), using=using)
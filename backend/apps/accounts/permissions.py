@@ -1,5 +1,6 @@
 from rest_framework.permissions import BasePermission
 from django.contrib.auth import get_user_model
+from apps.permission.context import get_authorization
 
 User = get_user_model()
 
@@ -8,6 +9,13 @@ WRITE_METHODS = ['POST']
 EDIT_METHODS = ['PUT', 'PATCH']
 DELETE_METHODS = ['DELETE']
 
+PERMISSION_MAP = (
+    (READ_METHODS, 'permission_read'),
+    (WRITE_METHODS, 'permission_write'),
+    (EDIT_METHODS, 'permission_update'),
+    (DELETE_METHODS, 'permission_delete'),
+)
+
 class IsAuthenticatedOrWriteOnly(BasePermission):
     """
     Allows unauthenticated POST requests (e.g., for registration) but requires
@@ -24,7 +32,8 @@ class IsProfileOwner(BasePermission):
     Allows access if the user owns the profile object (obj.user == request.user).
     """
     def has_object_permission(self, request, view, obj):
-        return hasattr(obj, 'user') and obj.user == request.user
+        user = get_authorization(request).user
+        return getattr(obj, 'user_id', None) is not None and obj.user_id == user.pk
 
 class HasModelPermission(BasePermission):
     """
@@ -35,29 +44,19 @@ class HasModelPermission(BasePermission):
         if not request.user or not request.user.is_authenticated:
             return False
 
-        if request.user.is_superuser:
+        authorization = get_authorization(request)
+        if authorization.is_superuser:
             return True
 
         # Get module name from view or default to 'user'
         module_name = getattr(view, 'module_name', 'user')
 
-        try:
-            profile = request.user.profile
-            if not profile:
-                return False
-        except User.profile.RelatedObjectDoesNotExist:
+        if authorization.profile is None:
             return False
 
-        permission_map = {
-            READ_METHODS: 'permission_read',
-            WRITE_METHODS: 'permission_write',
-            EDIT_METHODS: 'permission_update',
-            DELETE_METHODS: 'permission_delete',
-        }
-
-        for methods, permission in permission_map.items():
+        for methods, permission in PERMISSION_MAP:
             if request.method in methods:
-                return profile.get_permission_for_app(module_name, permission)
+                return authorization.has(module_name, permission)
 
         return False
 
@@ -71,7 +70,8 @@ class HasOtherPermission(BasePermission):
         if not request.user or not request.user.is_authenticated:
             return False
 
-        if request.user.is_superuser:
+        authorization = get_authorization(request)
+        if authorization.is_superuser:
             return True
 
         # Get module name from view
@@ -79,14 +79,10 @@ class HasOtherPermission(BasePermission):
         if not module_name:
             return False
 
-        try:
-            profile = request.user.profile
-            if not profile:
-                return False
-        except User.profile.RelatedObjectDoesNotExist:
+        if authorization.profile is None:
             return False
 
-        modules_permissions = profile.get_permissions_for_modules()
+        modules_permissions = authorization.get_permissions_for_modules()
 
         if module_name not in modules_permissions:
             return False
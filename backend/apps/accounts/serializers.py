@@ -3,6 +3,8 @@ from drf_extra_fields.fields import Base64ImageField
 from django.contrib.auth import get_user_model
 from .models import User, Profile
 from apps.permission.serializers import ProfilePermissionBasicSerializer
+from apps.permission.context import get_authorization
+from apps.utils.serializers import BatchLoaderMixin
 from apps.address.serializers import (
     CountrySerializer,
     StateSerializer,
@@ -12,13 +14,16 @@ from apps.address.serializers import (
 
 User = get_user_model()
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(BatchLoaderMixin, serializers.ModelSerializer):
     permission_set = ProfilePermissionBasicSerializer(source='permission', read_only=True)
     country_set = CountrySerializer(source='country', read_only=True)
     state_set = StateSerializer(source='state', read_only=True)
     city_set = CitySerializer(source='city', read_only=True)
     address_type_set = AddressTypeSerializer(source='address_type', read_only=True)
     permissions = serializers.SerializerMethodField()
+    get_uuid = serializers.UUIDField(source='user_id', read_only=True)
+    get_email = serializers.EmailField(source='user.email', read_only=True)
+    is_active = serializers.BooleanField(source='user.is_active', read_only=True)
 
     class Meta:
         model = Profile
@@ -50,16 +55,23 @@ class ProfileSerializer(serializers.ModelSerializer):
             'is_active',
             'permissions',
         ]
-        read_only_fields = ['get_full_name', 'get_uuid', 'get_email', 'is_active']
+        read_only_fields = ['get_full_name']
 
     def get_permissions(self, obj):
+        request = self.context.get('request')
+        if request is not None:
+            authorization = get_authorization(request)
+            if authorization.profile is not None and authorization.profile.pk == obj.pk:
+                return authorization.get_permissions_for_modules()
         return obj.get_permissions_for_modules()
 
 class ProfileBasicSerializer(serializers.ModelSerializer):
+    get_uuid = serializers.UUIDField(source='user_id', read_only=True)
+
     class Meta:
         model = Profile
         fields = ['id', 'first_name', 'last_name', 'get_full_name', 'get_uuid']
-        read_only_fields = ['get_full_name', 'get_uuid']
+        read_only_fields = ['get_full_name']
 
 class ProfileToOrderListSerializer(serializers.ModelSerializer):
     class Meta:
@@ -68,12 +80,15 @@ class ProfileToOrderListSerializer(serializers.ModelSerializer):
         read_only_fields = ['get_full_name']
 
 class ProfileAuthorSerializer(serializers.ModelSerializer):
+    get_uuid = serializers.UUIDField(source='user_id', read_only=True)
+    is_active = serializers.BooleanField(source='user.is_active', read_only=True)
+
     class Meta:
         model = Profile
         fields = ['id', 'first_name', 'last_name', 'get_full_name', 'get_uuid', 'is_active']
-        read_only_fields = ['get_full_name', 'get_uuid', 'is_active']
+        read_only_fields = ['get_full_name']
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(BatchLoaderMixin, serializers.ModelSerializer):
     profile = ProfileSerializer()
 
     class Meta:
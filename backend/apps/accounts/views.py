@@ -5,6 +5,9 @@ from rest_framework.viewsets import ModelViewSet
 from rest_framework import filters
 from django.http import Http404
 from django_filters import rest_framework as django_filters
+from apps.utils.cache import ModelViewSetCached
+from apps.utils.planner import QueryPlanMixin
+from apps.permission.models import PermissionOptions
 from .models import User, Profile
 from .serializers import (
     UserProfileSerializer,
@@ -16,15 +19,18 @@ from .serializers import (
     ProfileIsAdminSerializer,
 )
 from .permissions import HasModelPermission, IsProfileOwner
+from .filters import ProfileSearchFilter
 from .pagination import AccountPagination
 
-class UserProfileViewSet(ModelViewSet):
+class UserProfileViewSet(QueryPlanMixin, ModelViewSetCached):
+    cache_scope = 'permission'
+    cache_related_model_classes = [Profile, PermissionOptions]
     permission_classes = [HasModelPermission]
     serializer_class = UserProfileSerializer
     http_method_names = ['get', 'post', 'head', 'put', 'patch']
     pagination_class = AccountPagination
     queryset = User.objects.all().order_by('date_joined')
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter, django_filters.DjangoFilterBackend]
+    filter_backends = [ProfileSearchFilter, filters.OrderingFilter, django_filters.DjangoFilterBackend]
     module_name = 'user'
 
     search_fields = [
@@ -37,7 +43,6 @@ class UserProfileViewSet(ModelViewSet):
         'profile__neighborhood',
         'profile__complement',
         'profile__zip_code',
-        'profile__is_admin',
     ]
 
     ordering_fields = [
@@ -155,7 +160,9 @@ class ActivateUserView(UpdateAPIView):
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class ProfileAuthorViewSet(ModelViewSet):
+class ProfileAuthorViewSet(QueryPlanMixin, ModelViewSetCached):
+    cache_scope = 'permission'
+    cache_related_model_classes = [User]
     http_method_names = ['get', 'options', 'head']
     permission_classes = [HasModelPermission]
     serializer_class = ProfileAuthorSerializer
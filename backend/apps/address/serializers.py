@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from apps.utils.serializers import BatchLoaderMixin
 from .models import (
         Country,
         State,
@@ -8,12 +9,15 @@ from .models import (
 )
 
 
-class CountrySerializer(serializers.ModelSerializer):
+class CountrySerializer(BatchLoaderMixin, serializers.ModelSerializer):
+    cache_fragment = True
+
     class Meta:
         model = Country
         fields = '__all__'
 
-class StateSerializer(serializers.ModelSerializer):
+class StateSerializer(BatchLoaderMixin, serializers.ModelSerializer):
+    cache_fragment = True
     country_set = CountrySerializer(source='country', read_only=True)
     class Meta:
         model = State
@@ -25,7 +29,8 @@ class StateSerializer(serializers.ModelSerializer):
                 'country_set',
         ]
 
-class CitySerializer(serializers.ModelSerializer):
+class CitySerializer(BatchLoaderMixin, serializers.ModelSerializer):
+    cache_fragment = True
     state_set = StateSerializer(source='state', read_only=True)
     class Meta:
         model = City
@@ -3,6 +3,7 @@ from rest_framework import filters
 from rest_framework import status
 from rest_framework.response import Response
 from apps.utils.cache import ModelViewSetCached
+from apps.utils.planner import QueryPlanMixin
 
 from .pagination import AddressPagination
 from .models import (
@@ -25,6 +26,9 @@ from .permissions import (
 
 class CountryViewSet(ModelViewSetCached):
     http_method_names = ['get', 'head']
+    cache_local = True
+    cache_stale_timeout = 3600
+    cache_warm = True
     serializer_class = CountrySerializer
     permission_classes = ( IsAuthenticated,)
     pagination_class = AddressPagination
@@ -38,8 +42,12 @@ class CountryViewSet(ModelViewSetCached):
     def get_queryset(self):
         return Country.objects.all().order_by('pk')
     
-class StateViewSet(ModelViewSetCached):
+class StateViewSet(QueryPlanMixin, ModelViewSetCached):
     http_method_names = ['get', 'head']
+    cache_local = True
+    cache_stale_timeout = 3600
+    cache_warm = True
+    cache_warm_filters = ['country']
     serializer_class = StateSerializer
     permission_classes = ( IsAuthenticated,)
     pagination_class = AddressPagination
@@ -58,8 +66,12 @@ class StateViewSet(ModelViewSetCached):
     def get_queryset(self):
         return State.objects.all().order_by('pk')
     
-class CityViewSet(ModelViewSetCached):
+class CityViewSet(QueryPlanMixin, ModelViewSetCached):
     http_method_names = ['get', 'head']
+    cache_local = True
+    cache_stale_timeout = 3600
+    cache_warm = True
+    cache_warm_filters = ['state']
     serializer_class = CitySerializer
     permission_classes = ( IsAuthenticated,)
     pagination_class = AddressPagination
@@ -95,6 +107,9 @@ class AddressTypeViewSet(ModelViewSetCached):
 
 class NeighborhoodTypeViewSet(ModelViewSetCached):
     http_method_names = ['get', 'head']
+    cache_local = True
+    cache_stale_timeout = 3600
+    cache_warm = True
     serializer_class = NeighborhoodTypeSerializer
     permission_classes = ( IsAuthenticated,)
     pagination_class = AddressPagination
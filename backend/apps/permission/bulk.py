@@ -0,0 +1,103 @@
+from collections import defaultdict
+
+from django.db import connections
+from django.db import transaction
+from django.db import DEFAULT_DB_ALIAS
+
+from apps.accounts.models import Profile
+from apps.utils.cache import CACHE_ENABLE, CacheManager
+from .models import PermissionOptions
+from .matrix import ACTIONS
+from .revocation import schedule_revocation, forget_users
+
+def upsert_options(profile, options_data, using=DEFAULT_DB_ALIAS):
+    """
+    Creates or updates the options of a role with INSERT ... ON CONFLICT
+    on unique_permission_options_profile_app, updating only the actions
+    each option carries. Returns [{'app_option', 'status'}] with status
+    'created' or 'updated'.
+
+    Bulk writes send no signal, so the mask, the matrix, the members'
+    tokens (when options changed) and the cached views are handled here.
+    """
+    options = {}
+    for option_data in options_data:
+        options[option_data['app_option']] = option_data
+    if not options:
+        return []
+
+    existing = set(PermissionOptions.objects.using(using).filter(
+        profile=profile, app_option__in=options
+    ).values_list('app_option', flat=True))
+
+    # Rows carrying the same actions share one statement, usually all.
+    groups = defaultdict(list)
+    for app_option, option_data in options.items():
+        groups[tuple(action for action in ACTIONS if action in option_data)].append(option_data)
+
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    columns = ('profile_id', 'app_option') + ACTIONS
+    with connection.cursor() as cursor:
+        for actions, rows in groups.items():
+            if actions:
+                conflict = 'DO UPDATE SET ' + ', '.join(f"{quote(action)} = EXCLUDED.{quote(action)}" for action in actions)
+            else:
+                conflict = 'DO NOTHING'
+
+            values = ', '.join(['(' + ', '.join(['%s'] * len(columns)) + ')'] * len(rows))
+            params = [
+                value
+                for row in rows
+                for value in [profile.pk, row['app_option']] + [row.get(action, False) for action in ACTIONS]
+            ]
+            cursor.execute(
+                f"INSERT INTO {quote(PermissionOptions._meta.db_table)} "
+                f"({', '.join(quote(column) for column in columns)}) VALUES {values} "
+                f"ON CONFLICT ({quote('profile_id')}, {quote('app_option')}) {conflict}",
+                params,
+            )
+
+    profile.sync_options(using)
+    if existing:
+        schedule_revocation([profile.pk], using)
+    if CACHE_ENABLE:
+        CacheManager().clear_cache_tree_by_account('PermissionOptions', '*', using)
+
+    return [
+        {'app_option': app_option, 'status': 'updated' if app_option in existing else 'created'}
+        for app_option in options
+    ]
+
+@transaction.atomic
+def assign_role(user_uuids, permission, to_remove=False, using=DEFAULT_DB_ALIAS):
+    """
+    Assigns a role to, or removes it from, the profiles of the users in one
+    UPDATE. Returns [{'user_uuid', 'status'}] with status 'assigned',
+    'removed', 'unchanged' or 'not_found'.
+    """
+    user_uuids = list(dict.fromkeys(user_uuids))
+    current = dict(Profile.objects.using(using).filter(user_id__in=user_uuids).values_list('user_id', 'permission_id'))
+
+    if to_remove:
+        changed = [uuid for uuid, permission_id in current.items() if permission_id == permission.pk]
+        Profile.objects.using(using).filter(user_id__in=changed).update(permission=None)
+        status = 'removed'
+    else:
+        changed = [uuid for uuid, permission_id in current.items() if permission_id != permission.pk]
+        Profile.objects.using(using).filter(user_id__in=changed).update(permission=permission)
+        status = 'assigned'
+
+    if changed:
+        transaction.on_commit(lambda: forget_users(changed), using=using)
+        if CACHE_ENABLE:
+            CacheManager().clear_cache_tree_by_account('Profile', '*', using)
+
+    updated = set(changed)
+    return [
+        {
+            'user_uuid': uuid,
+            'status': status if uuid in updated else 'unchanged' if uuid in current else 'not_found',
+        }
+        for uuid in user_uuids
+    ]
@@ -0,0 +1,80 @@
+import copy
+
+from apps.accounts.models import User
+from .matrix import FULL_MATRIX, EMPTY_MATRIX
+
+class AuthorizationContext:
+    """
+    What the permission classes and serializers need to know about the
+    user of a request: the profile, the admin flags and the permission
+    matrix. Resolved once per request by get_authorization.
+    """
+    def __init__(self, user, profile=None, matrix=EMPTY_MATRIX):
+        self.user = user
+        self.profile = profile
+        self.matrix = matrix
+
+    @classmethod
+    def resolve(cls, user):
+        if user is None or not user.is_authenticated:
+            return cls(user)
+
+        # Memoized per user, so a warm request runs no query here.
+        profile = user.get_profile()
+        if profile is not None:
+            # The memoized instance is shared; link a copy to this user. The
+            # role is copied too, its matrix is built from the mask it was
+            # loaded with, so no query is run for it.
+            profile = copy.copy(profile)
+            profile.user = user
+            if profile.permission is not None:
+                profile.permission = copy.copy(profile.permission)
+        User.profile.related.set_cached_value(user, profile)
+
+        if user.is_superuser:
+            matrix = FULL_MATRIX
+        elif profile is not None:
+            matrix = profile.get_permission_matrix()
+        else:
+            matrix = EMPTY_MATRIX
+        return cls(user, profile, matrix)
+
+    @property
+    def is_authenticated(self):
+        return bool(self.user and self.user.is_authenticated)
+
+    @property
+    def is_superuser(self):
+        return self.is_authenticated and self.user.is_superuser
+
+    @property
+    def is_staff(self):
+        return self.is_authenticated and self.user.is_staff
+
+    @property
+    def is_admin(self):
+        return self.profile is not None and self.profile.is_admin
+
+    def has_full_permission(self):
+        return self.is_superuser or (self.profile is not None and (self.is_staff or self.is_admin))
+
+    def has(self, app_option, action):
+        return self.matrix.has(app_option, action)
+
+    def get_permissions_for_modules(self):
+        return self.matrix.to_modules()
+
+def get_authorization(request):
+    """
+    Returns the AuthorizationContext of a request, resolving it on first
+    use. It is kept on the underlying HttpRequest, so the DRF request,
+    its permission classes and serializers all share it.
+    """
+    http_request = getattr(request, '_request', request)
+    user = getattr(request, 'user', None)
+
+    authorization = getattr(http_request, 'authorization', None)
+    if authorization is None or authorization.user is not user:
+        authorization = AuthorizationContext.resolve(user)
+        http_request.authorization = authorization
+    return authorization
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from apps.permission.models import ProfilePermissions
+from apps.permission.matrix import PermissionMatrix, APPS, ACTIONS
+
+
+class Command(BaseCommand):
+    help = 'Measures permission checks per second, reading option rows versus the bitmask'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--role', type=int,
+                            help='ProfilePermissions id to check (default: the one with most options)')
+        parser.add_argument('--seconds', type=float, default=2.0,
+                            help='Duration of each measurement')
+
+    def handle(self, *args, **options):
+        roles = ProfilePermissions.objects.annotate(total=Count('options')).order_by('-total', 'pk')
+        if options['role'] is not None:
+            roles = roles.filter(pk=options['role'])
+        role = roles.first()
+        if role is None:
+            raise CommandError('No permission profile to benchmark')
+
+        checks = [(app_option, action) for app_option in APPS for action in ACTIONS]
+        matrix = PermissionMatrix(int(role.permission_mask))
+
+        def check_options(app_option, action):
+            # What every check did before: one option row per check.
+            option = role.options.filter(app_option=app_option).first()
+            return getattr(option, action, False) if option else False
+
+        self.stdout.write(f"Role '{role.name}' (#{role.pk}), {role.total} options, "
+                          f"{len(checks)} module/action pairs\n")
+
+        results = []
+        for label, check in (
+            ('option rows (before)', check_options),
+            ('bitmask (after)', matrix.has),
+        ):
+            rate = self.measure(check, checks, options['seconds'])
+            results.append(rate)
+            self.stdout.write(f"{label:<24} {rate:>16,.0f} checks/s")
+
+        self.stdout.write(self.style.SUCCESS(f"\nbitmask is {results[-1] / results[0]:,.0f}x the option rows"))
+
+    def measure(self, check, checks, seconds):
+        count = 0
+        start = time.perf_counter()
+        deadline = start + seconds
+        while time.perf_counter() < deadline:
+            for app_option, action in checks:
+                check(app_option, action)
+            count += len(checks)
+        return count / (time.perf_counter() - start)
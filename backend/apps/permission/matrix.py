@@ -0,0 +1,106 @@
+import environ
+
+env = environ.Env()
+
+PERMISSION_CACHE_TIMEOUT = env.int("BACKEND_CACHE_PERMISSION_TIMEOUT", default=3600)
+
+ACTIONS = (
+    'permission_read',
+    'permission_write',
+    'permission_update',
+    'permission_delete',
+)
+
+# Modules listed by Profile.get_permissions_for_modules, as (key, app_option).
+MODULES = (
+    ('user', 'User'),
+    ('permission', 'Permission'),
+    ('company', 'Company'),
+    ('checklist', 'Checklist'),
+    ('order', 'Order'),
+    ('order_settings', 'OrderSettings'),
+    ('partner', 'Partner'),
+    ('partner_settings', 'PartnerSettings'),
+    ('stock', 'Stock'),
+    ('stock_settings', 'StockSettings'),
+    ('product', 'Product'),
+    ('product_settings', 'ProductSettings'),
+    ('supplier', 'Supplier'),
+    ('report', 'Report'),
+    ('report_settings', 'ReportSettings'),
+    ('admin', 'Admin'),
+)
+
+PERMISSIONS = (
+    ('can_read', 'permission_read'),
+    ('can_edit', 'permission_update'),
+    ('can_write', 'permission_write'),
+    ('can_delete', 'permission_delete'),
+)
+
+# Bit layout of ProfilePermissions.permission_mask: one bit per action
+# of ACTIONS for every app option, in this order. Masks are stored, so
+# entries are only ever appended.
+APPS = (
+    'Default',
+    'User',
+    'Permission',
+    'Company',
+    'Checklist',
+    'Order',
+    'OrderSettings',
+    'Partner',
+    'PartnerSettings',
+    'Stock',
+    'StockSettings',
+    'Product',
+    'ProductSettings',
+    'Supplier',
+    'Report',
+    'ReportSettings',
+    'Admin',
+)
+
+BITS = {
+    (app_option, action): 1 << (index * len(ACTIONS) + offset)
+    for index, app_option in enumerate(APPS)
+    for offset, action in enumerate(ACTIONS)
+}
+
+class PermissionMatrix:
+    """
+    Module × action permissions of a ProfilePermissions as one integer
+    mask laid out by APPS and ACTIONS, so a check is a bitwise AND.
+    """
+    __slots__ = ('mask', 'full')
+
+    def __init__(self, mask=0, full=False):
+        self.mask = mask
+        self.full = full
+
+    @classmethod
+    def from_options(cls, options):
+        """
+        Builds the matrix from (app_option, *ACTIONS) tuples.
+        """
+        mask = 0
+        for app_option, *granted in options:
+            for action, allowed in zip(ACTIONS, granted):
+                if allowed:
+                    mask |= BITS.get((app_option, action), 0)
+        return cls(mask)
+
+    def has(self, app_option, action):
+        if self.full:
+            return True
+        return bool(self.mask & BITS.get((app_option, action), 0))
+
+    def to_modules(self):
+        return {
+            key: {name: self.has(app_option, action) for name, action in PERMISSIONS}
+            for key, app_option in MODULES
+        }
+
+# Superusers, staff and profile admins are granted everything.
+FULL_MATRIX = PermissionMatrix(full=True)
+EMPTY_MATRIX = PermissionMatrix()
@@ -0,0 +1,74 @@
+# Generated by Django 3.2 on 2026-10-18 14:45
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+# The bit layout of apps.permission.matrix when the mask was added, kept
+# here so later changes to that module do not change this migration.
+ACTIONS = (
+    'permission_read',
+    'permission_write',
+    'permission_update',
+    'permission_delete',
+)
+
+APPS = (
+    'Default',
+    'User',
+    'Permission',
+    'Company',
+    'Checklist',
+    'Order',
+    'OrderSettings',
+    'Partner',
+    'PartnerSettings',
+    'Stock',
+    'StockSettings',
+    'Product',
+    'ProductSettings',
+    'Supplier',
+    'Report',
+    'ReportSettings',
+    'Admin',
+)
+
+BITS = {
+    (app_option, action): 1 << (index * len(ACTIONS) + offset)
+    for index, app_option in enumerate(APPS)
+    for offset, action in enumerate(ACTIONS)
+}
+
+
+def backfill_permission_mask(apps, schema_editor):
+    ProfilePermissions = apps.get_model('permission', 'ProfilePermissions')
+    PermissionOptions = apps.get_model('permission', 'PermissionOptions')
+    using = schema_editor.connection.alias
+
+    options = defaultdict(list)
+    for profile_id, *option in PermissionOptions.objects.using(using).values_list('profile_id', 'app_option', *ACTIONS):
+        options[profile_id].append(option)
+
+    for profile_id, rows in options.items():
+        mask = 0
+        for app_option, *granted in rows:
+            for action, allowed in zip(ACTIONS, granted):
+                if allowed:
+                    mask |= BITS.get((app_option, action), 0)
+        ProfilePermissions.objects.using(using).filter(pk=profile_id).update(permission_mask=mask)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('permission', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profilepermissions',
+            name='permission_mask',
+            field=models.DecimalField(decimal_places=0, default=0, editable=False, max_digits=40),
+        ),
+        migrations.RunPython(backfill_permission_mask, migrations.RunPython.noop),
+    ]
@@ -1,16 +1,82 @@
+from collections import defaultdict
+
 from django.db import models
+from django.db import transaction
+from django.db import DEFAULT_DB_ALIAS
 from django.db.models.signals import post_save
+from django.db.models.signals import post_delete
 from django.dispatch import receiver
-from django.conf import settings
-from rest_framework.authtoken.models import Token
+from apps.utils.cache import CACHE_ENABLE, CacheManager
+from .matrix import PermissionMatrix, ACTIONS
+from .revocation import schedule_revocation, forget_roles
 
 class ProfilePermissions(models.Model):
     name = models.CharField(max_length=50, blank=False, null=False, unique=True)
     description = models.TextField(max_length=200, null=True, blank=True)
+    # Every option of the role as one mask (see apps.permission.matrix),
+    # numeric since the layout outgrows 64 bits.
+    permission_mask = models.DecimalField(max_digits=40, decimal_places=0, default=0, editable=False)
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # The mask is only written by sync_masks: saving an instance read
+        # before the options changed (e.g. renaming the role) would write
+        # the old mask back over the synced one.
+        if not self._state.adding:
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                update_fields = [field.name for field in self._meta.concrete_fields if not field.primary_key]
+            kwargs['update_fields'] = [name for name in update_fields if name != 'permission_mask']
+        super().save(*args, **kwargs)
+
+    def __getstate__(self):
+        # The matrix is not pickled along with the row (e.g. by BatchLoader).
+        state = super().__getstate__()
+        state.pop('_matrix', None)
+        return state
+
+    def get_matrix(self):
+        """
+        Returns the PermissionMatrix of this role, built from the mask read
+        with the row. It is kept on the instance, so profiles sharing it (a
+        page loaded by BatchLoader) share one matrix.
+        """
+        if getattr(self, '_matrix', None) is None:
+            self._matrix = PermissionMatrix(int(self.permission_mask or 0))
+        return self._matrix
+
+    @classmethod
+    def sync_masks(cls, pks, using=DEFAULT_DB_ALIAS):
+        """
+        Recomputes permission_mask of the given roles from their options.
+        Returns {pk: mask}.
+        """
+        options = defaultdict(list)
+        rows = PermissionOptions.objects.using(using).filter(profile_id__in=pks)
+        for profile_id, *option in rows.values_list('profile_id', 'app_option', *ACTIONS):
+            options[profile_id].append(option)
+
+        masks = {pk: PermissionMatrix.from_options(options[pk]).mask for pk in pks}
+        for pk, mask in masks.items():
+            cls.objects.using(using).filter(pk=pk).update(permission_mask=mask)
+        return masks
+
+    def sync_options(self, using=DEFAULT_DB_ALIAS):
+        """
+        Brings the mask and the cached matrix in line with the options,
+        after they were written.
+        """
+        self.permission_mask = ProfilePermissions.sync_masks([self.pk], using)[self.pk]
+        self.__dict__.pop('_matrix', None)
+        # The copies of the row carry the mask: the one BatchLoader keeps and
+        # the members' memoized profiles. Dropped once the write commits, so
+        # no reader caches the old options.
+        if CACHE_ENABLE:
+            CacheManager().loader.watch_change(ProfilePermissions, self, using)
+        transaction.on_commit(lambda: forget_roles([self.pk], using), using=using)
+
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=['name'], name='unique_profile_permission_name'),
@@ -52,7 +118,16 @@ class PermissionOptions(models.Model):
         ]
 
 @receiver(post_save, sender=PermissionOptions)
-def logout_user_with_from_permission(sender, instance, created, **kwargs):
+@receiver(post_delete, sender=PermissionOptions)
+def sync_permission_mask(sender, instance, using=None, **kwargs):
+    profile = sender.profile.field.get_cached_value(instance, None)
+    if profile is None:
+        profile = ProfilePermissions(pk=instance.profile_id)
+    profile.sync_options(using or DEFAULT_DB_ALIAS)
+
+@receiver(post_save, sender=PermissionOptions)
+@receiver(post_delete, sender=PermissionOptions)
+def logout_user_with_from_permission(sender, instance, created=False, using=None, **kwargs):
     if not created:
-        user_list = settings.AUTH_USER_MODEL.objects.filter(profile__permission=instance.profile)
-        Token.objects.filter(user__in=user_list).delete()
\ No newline at end of file
+        # Once per role and transaction, after it commits.
+        schedule_revocation([instance.profile_id], using or DEFAULT_DB_ALIAS)
\ No newline at end of file
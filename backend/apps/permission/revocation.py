@@ -0,0 +1,96 @@
+from django.db import connections
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.authtoken.models import Token
+
+from apps.accounts.models import Profile
+from apps.utils.cache import CACHE_ENABLE, CacheManager, CommitBatches, invalidate_cached_method
+
+# Tags evicted per round trip when dropping what is cached about members.
+EVICT_CHUNK_SIZE = 1000
+
+class RevocationBatch:
+    """
+    Roles whose members are logged out once the transaction commits,
+    deduplicated so a role edit saving N options revokes once.
+    """
+    def __init__(self, using):
+        self.using = using
+        self.roles = set()
+
+    def update(self, role_ids):
+        self.roles.update(role_ids)
+
+    def __call__(self):
+        if not self.roles:
+            return
+        roles, self.roles = self.roles, set()
+        revoke_roles(roles, self.using)
+
+batches = CommitBatches(RevocationBatch)
+
+def schedule_revocation(role_ids, using=DEFAULT_DB_ALIAS):
+    """
+    Logs out the members of the roles once the current transaction
+    commits, or right away in autocommit mode.
+    """
+    batches.add(using, role_ids)
+
+def revoke_roles(role_ids, using=DEFAULT_DB_ALIAS):
+    """
+    Deletes the tokens of every member of the roles and drops their cached
+    profiles and the roles' matrices. Returns the number of tokens deleted.
+    """
+    role_ids = set(role_ids)
+    if not role_ids:
+        return 0
+
+    connection = connections[using]
+    quote = connection.ops.quote_name
+
+    # One DELETE ... WHERE user_id IN (SELECT ...). QuerySet.delete() would
+    # load every token first, since Token has post_delete receivers.
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {quote(Token._meta.db_table)} "
+            f"WHERE {quote(Token._meta.get_field('user').column)} IN ("
+            f"SELECT {quote(Profile._meta.get_field('user').column)} FROM {quote(Profile._meta.db_table)} "
+            f"WHERE {quote(Profile._meta.get_field('permission').column)} IN ({', '.join(['%s'] * len(role_ids))}))",
+            list(role_ids),
+        )
+        deleted = cursor.rowcount
+
+    if CACHE_ENABLE:
+        # Raw deletes send no signal. Other workers keyed the accounts of
+        # these users by the deleted tokens, which no longer authenticate.
+        members = Profile.objects.using(using).filter(permission_id__in=role_ids)
+        forget_users(members.values_list('user_id', flat=True), role_ids)
+
+    return deleted
+
+def forget_roles(role_ids, using=DEFAULT_DB_ALIAS):
+    """
+    Drops the memoized profiles of the members of the roles, which embed
+    the roles' masks, after the masks changed.
+    """
+    if not CACHE_ENABLE:
+        return
+
+    members = Profile.objects.using(using).filter(permission_id__in=role_ids).values_list('user_id', flat=True)
+    forget_users(members, role_ids)
+
+def forget_users(user_ids, role_ids=()):
+    """
+    Drops the memoized profiles of the users, the matrices of the roles
+    and the accounts this worker memoized for the users, after a bulk
+    write that sent no signal.
+    """
+    if not CACHE_ENABLE:
+        return
+
+    user_ids = list(user_ids)
+    CacheManager().account_resolver.forget(user_ids)
+
+    tags = [f'permission.{role_id}' for role_id in role_ids]
+    tags += [f'profile.{user_id}' for user_id in user_ids]
+    for start in range(0, len(tags), EVICT_CHUNK_SIZE):
+        invalidate_cached_method(*tags[start:start + EVICT_CHUNK_SIZE])
@@ -1,10 +1,16 @@
+import environ
+
 from rest_framework import serializers
+from django.db import transaction
 from django.contrib.auth import get_user_model
 from .models import ProfilePermissions, PermissionOptions
+from .bulk import upsert_options, assign_role
 from apps.accounts.models import Profile
 
 User = get_user_model()
 
+env = environ.Env()
+
 class PermissionOptionsSerializer(serializers.ModelSerializer):
     app_option = serializers.ChoiceField(choices=PermissionOptions.APPS_CHOICES)
 
@@ -48,36 +54,22 @@ class ProfilePermissionSerializer(serializers.ModelSerializer):
             })
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         options_data = validated_data.pop('options', [])
         profile = ProfilePermissions.objects.create(**validated_data)
-        for option_data in options_data:
-            PermissionOptions.objects.create(
-                profile=profile,
-                **option_data
-            )
+        upsert_options(profile, options_data)
         return profile
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         options_data = validated_data.pop('options', [])
         instance.name = validated_data.get('name', instance.name)
         instance.description = validated_data.get('description', instance.description)
         instance.save()
 
-        # Update or create PermissionOptions
-        for option_data in options_data:
-            app_option = option_data.get('app_option')
-            option, created = PermissionOptions.objects.get_or_create(
-                profile=instance,
-                app_option=app_option,
-                defaults=option_data
-            )
-            if not created:
-                option.permission_read = option_data.get('permission_read', option.permission_read)
-                option.permission_write = option_data.get('permission_write', option.permission_write)
-                option.permission_update = option_data.get('permission_update', option.permission_update)
-                option.permission_delete = option_data.get('permission_delete', option.permission_delete)
-                option.save()
+        # Update or create PermissionOptions in one statement
+        upsert_options(instance, options_data)
 
         return instance
 
@@ -115,4 +107,23 @@ class UserAddProfileSerializer(serializers.Serializer):
         else:
             profile.permission = permission
         profile.save()
-        return profile
\ No newline at end of file
+        return profile
+
+class UserBatchProfileSerializer(serializers.Serializer):
+    user_uuids = serializers.ListField(
+        child=serializers.UUIDField(),
+        allow_empty=False,
+        max_length=env.int("BACKEND_PERMISSION_BATCH_SIZE", default=10000)
+    )
+    permission_id = serializers.PrimaryKeyRelatedField(
+        queryset=ProfilePermissions.objects.all(),
+        required=True
+    )
+    to_remove = serializers.BooleanField(default=False)
+
+    def save(self):
+        return assign_role(
+            self.validated_data['user_uuids'],
+            self.validated_data['permission_id'],
+            self.validated_data['to_remove'],
+        )
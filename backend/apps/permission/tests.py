@@ -1,3 +1,44 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.db import transaction
+from django.test import TransactionTestCase
+
+from apps.permission import revocation
+
+
+class ScheduleRevocationTest(TransactionTestCase):
+
+    def test_rolled_back_roles_are_not_revoked(self):
+        with mock.patch.object(revocation, 'revoke_roles') as revoke_roles:
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    revocation.schedule_revocation([1])
+                    raise RuntimeError
+
+            with transaction.atomic():
+                revocation.schedule_revocation([2])
+
+        revoke_roles.assert_called_once_with({2}, 'default')
+
+    def test_rolled_back_savepoint_roles_are_not_revoked(self):
+        with mock.patch.object(revocation, 'revoke_roles') as revoke_roles:
+            with transaction.atomic():
+                revocation.schedule_revocation([1])
+                with self.assertRaises(RuntimeError):
+                    with transaction.atomic():
+                        revocation.schedule_revocation([2])
+                        raise RuntimeError
+                with transaction.atomic():
+                    revocation.schedule_revocation([3])
+
+        # Work of each savepoint is its own batch.
+        revoked = set().union(*(call.args[0] for call in revoke_roles.call_args_list))
+        self.assertEqual(revoked, {1, 3})
+
+    def test_roles_are_revoked_once_per_transaction(self):
+        with mock.patch.object(revocation, 'revoke_roles') as revoke_roles:
+            with transaction.atomic():
+                revocation.schedule_revocation([1])
+                revocation.schedule_revocation([1, 2])
+
+        revoke_roles.assert_called_once_with({1, 2}, 'default')
@@ -1,6 +1,6 @@
 from django.urls import include, path
 from rest_framework import routers
-from .views import ProfilePermissionViewSet, UserAddOrRemoveProfileView
+from .views import ProfilePermissionViewSet, UserAddOrRemoveProfileView, UsersAddOrRemoveProfileView
 
 app_name = 'permission'
 
@@ -8,6 +8,8 @@ router = routers.DefaultRouter()
 router.register(r'permissions', ProfilePermissionViewSet, basename='permission')
 
 urlpatterns = [
-    path('', include(router.urls)),  # Handles /permissions/ (list, create) and /permissions/<id>/ (retrieve, update, delete)
+    # Before the router, whose /permissions/<id>/ route would take them
     path('permissions/add-user/', UserAddOrRemoveProfileView.as_view(), name='add-or-remove-user'),  # Handles assigning/removing permissions
+    path('permissions/add-users/', UsersAddOrRemoveProfileView.as_view(), name='add-or-remove-users'),  # Handles assigning/removing permissions in bulk
+    path('', include(router.urls)),  # Handles /permissions/ (list, create) and /permissions/<id>/ (retrieve, update, delete)
 ]
\ No newline at end of file
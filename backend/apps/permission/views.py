@@ -1,15 +1,25 @@
 from rest_framework import status
 from rest_framework.generics import UpdateAPIView
 from rest_framework.response import Response
-from rest_framework.viewsets import ModelViewSet
 from rest_framework import filters
+from collections import Counter
 from django.http import Http404
-from .models import ProfilePermissions
-from .serializers import ProfilePermissionSerializer, ProfilePermissionBasicSerializer, UserAddProfileSerializer
+from apps.utils.cache import ModelViewSetCached
+from apps.utils.planner import QueryPlanMixin
+from .models import ProfilePermissions, PermissionOptions
+from .serializers import (
+    ProfilePermissionSerializer,
+    ProfilePermissionBasicSerializer,
+    UserAddProfileSerializer,
+    UserBatchProfileSerializer,
+)
 from .permissions import HasModelPermission
 from .pagination import PermissionPagination
 
-class ProfilePermissionViewSet(ModelViewSet):
+class ProfilePermissionViewSet(QueryPlanMixin, ModelViewSetCached):
+    cache_scope = 'permission'
+    cache_model_class = ProfilePermissions
+    cache_related_model_classes = [PermissionOptions]
     permission_classes = [HasModelPermission]
     http_method_names = ['get', 'post', 'head', 'put', 'patch', 'delete']
     pagination_class = PermissionPagination
@@ -38,4 +48,21 @@ class UserAddOrRemoveProfileView(UpdateAPIView):
             'status': 'success',
             'message': f"Permission {'removed from' if serializer.validated_data['to_remove'] else 'assigned to'} user successfully",
             'profile': ProfilePermissionBasicSerializer(profile.permission).data if profile.permission else None
-        }, status=status.HTTP_200_OK)
\ No newline at end of file
+        }, status=status.HTTP_200_OK)
+
+class UsersAddOrRemoveProfileView(UpdateAPIView):
+    permission_classes = [HasModelPermission]
+    serializer_class = UserBatchProfileSerializer
+    module_name = 'Permission'
+
+    def update(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = serializer.save()
+        summary = Counter(result['status'] for result in results)
+        return Response({
+            'status': 'success',
+            'message': f"Permission {'removed from' if serializer.validated_data['to_remove'] else 'assigned to'} {summary['removed'] + summary['assigned']} users successfully",
+            'summary': summary,
+            'results': results,
+        }, status=status.HTTP_200_OK)
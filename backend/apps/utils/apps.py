@@ -0,0 +1,22 @@
+from importlib import import_module
+
+from django.apps import AppConfig, apps
+from django.utils.module_loading import module_has_submodule
+
+
+class UtilsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.utils'
+
+    def ready(self):
+        from .cache import CacheManager
+        from .planner import planner
+
+        # Import the local views so every ModelViewSetCached subclass is
+        # registered before the cache dependency graph is frozen.
+        for app_config in apps.get_app_configs():
+            if app_config.name.startswith('apps.') and module_has_submodule(app_config.module, 'views'):
+                import_module(f'{app_config.name}.views')
+
+        CacheManager().freeze()
+        planner.freeze()
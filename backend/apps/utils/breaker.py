@@ -0,0 +1,116 @@
+import time
+import logging
+import threading
+import environ
+
+from django_redis.exceptions import ConnectionInterrupted
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+
+env = environ.Env()
+
+class CacheUnavailable(Exception):
+    """
+    Raised instead of calling Redis while the circuit breaker is open.
+    """
+
+class CircuitBreaker:
+    """
+    Stops calling Redis after BACKEND_CACHE_BREAKER_THRESHOLD consecutive
+    connection failures. While open, guarded calls raise CacheUnavailable
+    at once; after BACKEND_CACHE_BREAKER_COOLDOWN seconds a single call is
+    let through as a probe (half open) and its outcome closes the circuit
+    or opens it again.
+
+    Used as a context manager around Redis calls. Nested blocks of a thread
+    count as one call, only the outermost is checked and recorded.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    ERRORS = (ConnectionInterrupted, RedisConnectionError, RedisTimeoutError, OSError)
+
+    def __init__(self, on_change=None):
+        self.threshold = env.int("BACKEND_CACHE_BREAKER_THRESHOLD", default=5)
+        self.cooldown = env.float("BACKEND_CACHE_BREAKER_COOLDOWN", default=30.0)
+        self.on_change = on_change
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self.probing = False
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def allow(self):
+        changed = None
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = changed = self.HALF_OPEN
+
+            allowed = self.state == self.HALF_OPEN and not self.probing
+            if allowed:
+                self.probing = True
+
+        self.notify(changed)
+        return allowed
+
+    def success(self):
+        if self.state == self.CLOSED and not self.failures:
+            return
+
+        changed = None
+        with self.lock:
+            self.failures = 0
+            self.probing = False
+            if self.state != self.CLOSED:
+                self.state = changed = self.CLOSED
+
+        if changed:
+            logging.warning("[CACHE]: Redis is reachable again, circuit breaker closed")
+        self.notify(changed)
+
+    def failure(self, error):
+        changed = None
+        with self.lock:
+            self.failures += 1
+            self.probing = False
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.threshold):
+                self.opened_at = time.monotonic()
+                self.state = changed = self.OPEN
+
+        if changed:
+            logging.error(f"[CACHE ERROR]: circuit breaker open for {self.cooldown:g}s. Error: {error}")
+        self.notify(changed)
+
+    def notify(self, state):
+        if state and self.on_change is not None:
+            self.on_change(state)
+
+    def is_closed(self):
+        return self.state == self.CLOSED
+
+    def __enter__(self):
+        depth = getattr(self.local, 'depth', 0)
+        if not depth and not self.allow():
+            raise CacheUnavailable("Redis circuit breaker is open")
+        self.local.depth = depth + 1
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.local.depth -= 1
+        if self.local.depth:
+            return False
+
+        if exc_type is not None and issubclass(exc_type, self.ERRORS):
+            self.failure(exc)
+        else:
+            # Redis answered, even if the caller raised afterwards.
+            self.success()
+        return False
+
+# What a guarded call raises when Redis cannot be used.
+CACHE_ERRORS = (CacheUnavailable,) + CircuitBreaker.ERRORS
@@ -1,36 +1,610 @@
+import os
+import re
+import gzip
+import time
+import inspect
+import weakref
 import hashlib
 import logging
+import threading
 import environ
+import xxhash
+import redis
 
 from functools import wraps
+from contextlib import contextmanager
+from collections import OrderedDict
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
 
 from django.db import models
+from django.db import connections
+from django.db import transaction
+from django.db import DEFAULT_DB_ALIAS
 from django.core.cache import cache
 from django.db.models.signals import post_save
 from django.db.models.signals import post_delete
+from django.http import Http404, HttpResponse
+from django.utils.cache import patch_vary_headers
+from django_redis import get_redis_connection
 
+from rest_framework import filters
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.viewsets import ModelViewSet
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.exceptions import APIException
 from rest_framework.authtoken.models import Token
 
-def cache_method(timeout=10):
+from .metrics import CacheMetrics, KEYS_BUCKETS, AGE_BUCKETS
+from .breaker import CACHE_ERRORS, CacheUnavailable, CircuitBreaker
+from .loader import BatchLoader
+from .fragments import FragmentCache
+from .sharding import ShardRing
+
+env = environ.Env()
+
+COMPRESS_MIN_LENGTH = env.int("BACKEND_CACHE_COMPRESS_MIN_LENGTH", default=1024)
+
+re_accepts_gzip = re.compile(r'\bgzip\b')
+
+CACHE_ENABLE = env.bool("BACKEND_CACHE_ENABLE", default=False)
+
+def cache_method(timeout=10, tags=(), local=True):
+    """
+    Memoizes a method per instance, in the in-process LRU and in the Django
+    cache. Keys carry the module, class and instance pk; instances without
+    a pk are not memoized. None results are cached too, and coroutine
+    methods are supported.
+
+    tags is a list of strings, or a callable receiving the same arguments as
+    the method and returning them; invalidate_cached_method(*tags) drops
+    every result memoized under any of them. A result whose tags are
+    invalidated while it is computed is returned but not memoized.
+    """
     def decorator(func):
-        @wraps(func)
-        def wrapper(self, *args, **kwargs):
-            env = environ.Env()
-            if env.bool("BACKEND_CACHE_ENABLE") == True:
-                key = (func.__name__, args, frozenset(kwargs.items()))
-                keyHash = hashlib.sha1(repr(key).encode()).hexdigest()
-                result = cache.get(keyHash)
-                if result is None:
-                    result = func(self, *args, **kwargs)
-                    cache.set(keyHash, result, timeout)
+        def get_tags(self, args, kwargs):
+            return tags(self, *args, **kwargs) if callable(tags) else tags
+
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def wrapper(self, *args, **kwargs):
+                if not CACHE_ENABLE:
+                    return await func(self, *args, **kwargs)
+
+                memo = CacheManager().memo
+                key = memo.get_key(func, self, args, kwargs)
+                if key is None:
+                    return await func(self, *args, **kwargs)
+                result = memo.get_local(key) if local else MISSING
+                if result is MISSING:
+                    result = await sync_to_async(memo.get_shared)(key, local)
+                if result is not MISSING:
+                    return memo.unwrap(result)
+
+                call_tags = get_tags(self, args, kwargs)
+                mark = await sync_to_async(memo.get_mark)(call_tags)
+                result = await func(self, *args, **kwargs)
+                await sync_to_async(memo.set)(key, result, timeout, call_tags, mark, local)
                 return result
-            else:
-                return func(self, *args, **kwargs)
+        else:
+            @wraps(func)
+            def wrapper(self, *args, **kwargs):
+                if not CACHE_ENABLE:
+                    return func(self, *args, **kwargs)
+
+                memo = CacheManager().memo
+                key = memo.get_key(func, self, args, kwargs)
+                if key is None:
+                    return func(self, *args, **kwargs)
+                result = memo.get_local(key) if local else MISSING
+                if result is MISSING:
+                    result = memo.get_shared(key, local)
+                if result is not MISSING:
+                    return memo.unwrap(result)
+
+                call_tags = get_tags(self, args, kwargs)
+                mark = memo.get_mark(call_tags)
+                result = func(self, *args, **kwargs)
+                memo.set(key, result, timeout, call_tags, mark, local)
+                return result
+
         return wrapper
     return decorator
 
+def invalidate_cached_method(*tags):
+    """
+    Drops, in every worker, the results memoized under any of the tags.
+    """
+    return CacheManager().memo.invalidate(tags)
+
+MISSING = object()
+
+class CachedNone:
+    """
+    Stored in place of a None result, which cache.get cannot tell apart
+    from a miss. Pickles by reference, so identity survives the round trip.
+    """
+    def __reduce__(self):
+        return 'CACHED_NONE'
+
+CACHED_NONE = CachedNone()
+
+class CacheEntry:
+    """
+    Rendered response body along with the time it was computed. Bodies
+    larger than BACKEND_CACHE_COMPRESS_MIN_LENGTH are stored gzipped.
+    """
+    __slots__ = ('content', 'content_type', 'encoding', 'created')
+
+    def __init__(self, content, content_type, encoding=None, created=None):
+        self.content = content
+        self.content_type = content_type
+        self.encoding = encoding
+        self.created = time.time() if created is None else created
+
+    def __getstate__(self):
+        return (self.content, self.content_type, self.encoding, self.created)
+
+    def __setstate__(self, state):
+        self.content, self.content_type, self.encoding, self.created = state
+
+    @classmethod
+    def from_content(cls, content, content_type):
+        if len(content) >= COMPRESS_MIN_LENGTH:
+            return cls(gzip.compress(content, compresslevel=6), content_type, 'gzip')
+        return cls(content, content_type)
+
+    def get_content(self, accept_encoding=''):
+        """
+        Returns the body and its Content-Encoding for a client sending the
+        given Accept-Encoding header.
+        """
+        if self.encoding is None:
+            return self.content, None
+        if re_accepts_gzip.search(accept_encoding):
+            return self.content, self.encoding
+        return gzip.decompress(self.content), None
+
+    def get_age(self):
+        return max(time.time() - self.created, 0)
+
+class LocalCache:
+    """
+    Thread-safe in-process LRU map whose entries also expire after a TTL.
+    """
+    def __init__(self, max_size=1024, timeout=60):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        if timeout is None:
+            timeout = self.timeout
+
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + timeout)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate):
+        with self._lock:
+            for key in [k for k, (v, _) in self._data.items() if predicate(k, v)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+class AccountResolver:
+    """
+    Resolves the context account of an already authenticated request, or
+    '*' when its profile has none.
+
+    Accounts are memoized per credential (token key, or user for non-token
+    authentication such as BasicAuthentication), so a warm lookup costs no
+    SQL. Entries are dropped when the Token or Profile rows change.
+    """
+    def __init__(self):
+        self.accounts = LocalCache(
+            max_size=env.int("BACKEND_CACHE_ACCOUNT_SIZE", default=4096),
+            timeout=env.int("BACKEND_CACHE_ACCOUNT_TIMEOUT", default=300),
+        )
+
+        post_save.connect(self.watch_token, sender=Token,
+                          dispatch_uid='cache_account_token_save')
+        post_delete.connect(self.watch_token, sender=Token,
+                            dispatch_uid='cache_account_token_delete')
+        post_save.connect(self.watch_profile, sender='accounts.Profile',
+                          dispatch_uid='cache_account_profile_save')
+        post_delete.connect(self.watch_profile, sender='accounts.Profile',
+                            dispatch_uid='cache_account_profile_delete')
+
+    def get_identity(self, request):
+        if isinstance(getattr(request, 'auth', None), Token):
+            return f"token.{request.auth.key}"
+        return f"user.{request.user.pk}"
+
+    def resolve(self, request):
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            raise Exception("Request is not authenticated")
+
+        identity = self.get_identity(request)
+        item = self.accounts.get(identity)
+        if item is not None:
+            return item[1]
+
+        # Users without a context account share the model-wide namespace
+        # ('*'), the one invalidated by writes to models without an account.
+        account = getattr(getattr(user, 'profile', None), 'context_account_id', None)
+        if account is None:
+            account = '*'
+
+        self.accounts.set(identity, (user.pk, account))
+        return account
+
+    def watch_token(self, sender, instance, **kwargs):
+        self.accounts.delete(f"token.{instance.key}")
+        self.accounts.delete_where(lambda key, item: item[0] == instance.user_id)
+
+    def watch_profile(self, sender, instance, **kwargs):
+        self.accounts.delete_where(lambda key, item: item[0] == instance.user_id)
+
+    def forget(self, user_ids):
+        """
+        Drops the accounts memoized for any of the users.
+        """
+        user_ids = set(user_ids)
+        self.accounts.delete_where(lambda key, item: item[0] in user_ids)
+
+class InvalidationBatch:
+    """
+    Deduplicated (model, account) invalidations, row tags and plain keys
+    waiting for a transaction to commit. The batch itself is the on_commit
+    callback.
+    """
+    def __init__(self, manager):
+        self.manager = manager
+        self.pairs = set()
+        self.tags = set()
+        self.keys = set()
+
+    def update(self, pairs, tags, keys=()):
+        self.pairs.update(pairs)
+        self.tags.update(tags)
+        self.keys.update(keys)
+
+    def __call__(self):
+        if not (self.pairs or self.tags or self.keys):
+            return
+        pairs, self.pairs = self.pairs, set()
+        tags, self.tags = self.tags, set()
+        keys, self.keys = self.keys, set()
+        self.manager.apply_invalidation(pairs, tags, keys)
+
+class CommitBatches:
+    """
+    One batch of deferred work per thread, database and savepoint, run once
+    the current transaction commits, or right away in autocommit mode.
+
+    Batches expose update(*args), which collects work, and __call__(),
+    which runs and empties it. Every update inside a transaction registers
+    the batch with transaction.on_commit: the first registration to fire
+    runs all of it and the others find it empty. Batches are only held
+    weakly here, their registrations keep them alive: when the transaction,
+    or the savepoint the work was collected in, rolls back, Django drops
+    those and the batch goes with them, so none of its work ever runs.
+    """
+    def __init__(self, factory):
+        self.factory = factory
+        self.local = threading.local()
+
+    def add(self, using, *args):
+        connection = transaction.get_connection(using)
+        if not connection.in_atomic_block:
+            batch = self.factory(using)
+            batch.update(*args)
+            batch()
+            return
+
+        batches = getattr(self.local, 'batches', None)
+        if batches is None:
+            batches = self.local.batches = weakref.WeakValueDictionary()
+
+        key = (using, tuple(connection.savepoint_ids))
+        batch = batches.get(key)
+        if batch is None:
+            batch = batches[key] = self.factory(using)
+        batch.update(*args)
+        transaction.on_commit(batch, using)
+
+class TagIndex:
+    """
+    Redis sets mapping a tag (e.g. 'City.42' or 'City.filtered') to the cache
+    keys whose content depends on it, so a row write evicts only those keys.
+    """
+    # Long enough to outlive any computation that started before an eviction.
+    EVICTED_TIMEOUT = 300
+
+    def __init__(self, breaker, shards):
+        self.breaker = breaker
+        self.shards = shards
+
+    def get_tag_key(self, tag):
+        return cache.make_key(f"followme.tag.{tag}")
+
+    def get_evicted_key(self, tag):
+        return cache.make_key(f"followme.evicted.{tag}")
+
+    def add(self, key, tags, timeout):
+        self.add_many({key: tags}, timeout)
+
+    def add_many(self, entries, timeout):
+        """
+        Tags several keys in one round trip, entries being {key: tags}.
+        """
+        with self.breaker:
+            client = get_redis_connection('default')
+            with client.pipeline(transaction=False) as pipe:
+                for key, tags in entries.items():
+                    for tag in tags:
+                        tag_key = self.get_tag_key(tag)
+                        pipe.sadd(tag_key, key)
+                        pipe.expire(tag_key, timeout)
+                pipe.execute()
+
+    def evict(self, tags):
+        """
+        Deletes every key tagged with any of tags and returns them.
+        """
+        if not tags:
+            return set()
+
+        tag_keys = [self.get_tag_key(tag) for tag in tags]
+
+        with self.breaker:
+            client = get_redis_connection('default')
+            now = self.get_time(client)
+            with client.pipeline(transaction=False) as pipe:
+                for tag_key in tag_keys:
+                    pipe.smembers(tag_key)
+                pipe.delete(*tag_keys)
+                # Also set for tags without members yet: a value computed
+                # before this write is tagged only once it is stored.
+                for tag in tags:
+                    pipe.set(self.get_evicted_key(tag), now, ex=self.EVICTED_TIMEOUT)
+                results = pipe.execute()
+
+            keys = set()
+            for members in results[:len(tag_keys)]:
+                keys.update(member.decode() for member in members)
+
+            if keys:
+                self.shards.delete_many(keys)
+        return keys
+
+    def get_time(self, client):
+        seconds, microseconds = client.time()
+        return seconds * 1000000 + microseconds
+
+    def get_mark(self):
+        """
+        Returns the Redis time a computation starts at, see get_stale.
+        """
+        with self.breaker:
+            return self.get_time(get_redis_connection('default'))
+
+    def get_stale(self, tags, mark):
+        """
+        Returns the tags evicted since mark. A value computed meanwhile
+        that depends on any of them may predate a write.
+        """
+        tags = list(tags)
+        if not tags:
+            return set()
+
+        with self.breaker:
+            values = get_redis_connection('default').mget([self.get_evicted_key(tag) for tag in tags])
+        return {tag for tag, value in zip(tags, values) if value is not None and int(value) >= mark}
+
+class InvalidationBus:
+    """
+    Broadcasts generation bumps over Redis pub/sub so every worker drops its
+    memoized generations. The listener thread is started lazily per process,
+    which keeps it alive across gunicorn forks.
+    """
+    CHANNEL = 'followme.cache.invalidate'
+    HEALTH_CHECK_INTERVAL = 30
+
+    def __init__(self, callback):
+        self.callback = callback
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self.listen,
+                             name='cache-invalidation',
+                             daemon=True).start()
+
+    def get_client(self):
+        """
+        Returns a client of its own for the subscription. The cache's short
+        socket timeout would end every idle read; a dead connection is
+        noticed by the health check PING sent every HEALTH_CHECK_INTERVAL.
+        """
+        pool = get_redis_connection('default').connection_pool
+        kwargs = dict(pool.connection_kwargs, socket_timeout=None, socket_keepalive=True,
+                      health_check_interval=self.HEALTH_CHECK_INTERVAL)
+        return redis.Redis(connection_pool=redis.ConnectionPool(connection_class=pool.connection_class, **kwargs))
+
+    def listen(self):
+        client = None
+        while True:
+            pubsub = None
+            try:
+                if client is None:
+                    client = self.get_client()
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.CHANNEL)
+                # Anything published while disconnected was missed.
+                self.callback(None)
+
+                while True:
+                    # Returns at least once per interval, so the health check runs.
+                    message = pubsub.get_message(timeout=self.HEALTH_CHECK_INTERVAL)
+                    if message is None:
+                        continue
+                    for key in message['data'].decode().split('\n'):
+                        self.callback(key)
+            except Exception as e:
+                logging.error(f"Fail to listen cache invalidation. Error: {e}")
+                if pubsub is not None:
+                    pubsub.close()
+                time.sleep(1)
+
+    def publish(self, *keys):
+        get_redis_connection('default').publish(self.CHANNEL, '\n'.join(keys))
+
+class Memoizer:
+    """
+    Storage behind cache_method. Results are tagged in the TagIndex under
+    'memo.<tag>', so invalidation evicts them from Redis and the L1 of
+    every worker.
+    """
+    def __init__(self, manager):
+        self.manager = manager
+        self.local = LocalCache(
+            max_size=env.int("BACKEND_CACHE_MEMO_SIZE", default=2048),
+            timeout=env.int("BACKEND_CACHE_MEMO_L1_TIMEOUT", default=30),
+        )
+
+    def get_key(self, func, instance, args, kwargs):
+        """
+        Returns the key of a call, or None for an instance without a pk:
+        nothing else identifies it for sure, id() being reused once it is
+        garbage collected.
+        """
+        pk = getattr(instance, 'pk', None)
+        if pk is None:
+            return None
+
+        owner = type(instance)
+        arguments = hashlib.sha1(repr((args, sorted(kwargs.items()))).encode()).hexdigest()
+        key = f"followme.memo.{owner.__module__}.{owner.__qualname__}.{func.__name__}.{pk}.{arguments}"
+        return key
+
+    def get_local(self, key):
+        return self.local.get(key, MISSING)
+
+    def get_shared(self, key, local=True):
+        try:
+            with self.manager.breaker:
+                result = cache.get(key, MISSING)
+        except CACHE_ERRORS:
+            return MISSING
+
+        if result is not MISSING and local:
+            self.local.set(key, result)
+        return result
+
+    def unwrap(self, result):
+        return None if result is CACHED_NONE else result
+
+    def get_mark(self, tags):
+        """
+        Returns the mark of a call about to run, checked by set, or None
+        when it has no tags or Redis is unavailable.
+        """
+        if not tags:
+            return None
+        try:
+            return self.manager.tags.get_mark()
+        except CACHE_ERRORS:
+            return None
+
+    def set(self, key, result, timeout, tags, mark=None, local=True):
+        """
+        Stores a result, unless one of its tags was evicted since mark: it
+        may have been computed from rows a concurrent write replaced.
+        """
+        if result is None:
+            result = CACHED_NONE
+
+        tags = [f"memo.{tag}" for tag in tags]
+        if tags and mark is None:
+            # No mark, the result cannot be told apart from a stale one.
+            return
+
+        try:
+            with self.manager.breaker:
+                # Tagged first: an untagged entry could not be invalidated.
+                if tags:
+                    self.manager.tags.add(key, tags, timeout)
+                cache.set(key, result, timeout)
+
+                if tags and self.manager.tags.get_stale(tags, mark):
+                    cache.delete(key)
+                    return
+        except CACHE_ERRORS:
+            if tags:
+                return
+
+        if local:
+            # Keep the listener up so invalidations reach this worker's L1.
+            self.manager.bus.start()
+            self.local.set(key, result, min(timeout, self.local.timeout))
+
+    def invalidate(self, tags):
+        tags = [f"memo.{tag}" for tag in tags]
+        try:
+            keys = self.manager.tags.evict(tags)
+        except CACHE_ERRORS:
+            # Nothing can be evicted without Redis; this worker forgets its
+            # results and the tags are evicted once Redis is back.
+            self.local.clear()
+            self.manager.drop_invalidation((), tags)
+            return set()
+
+        if keys:
+            for key in keys:
+                self.local.delete(key)
+            self.manager.publish(*keys)
+        return keys
+
 class CacheManager:
     _instance = None
 
@@ -43,211 +617,985 @@ class CacheManager:
         if not hasattr(self, 'initialized'):
             self.initialized = True
             self.model_relation = {}
+            self.model_classes = {}
+            self.account_fields = {}
+            self.invalidation = {}
+            self.row_invalidation = {}
+            self.viewsets = []
+            self.frozen = False
+            self.pending = threading.local()
+            self.batches = CommitBatches(lambda using: InvalidationBatch(self))
+            self.account_resolver = AccountResolver()
+            self.breaker = CircuitBreaker(self.watch_breaker)
+            self.metrics = CacheMetrics(self.breaker)
+            self.metrics.gauge('followme_cache_breaker_open', lambda: int(not self.breaker.is_closed()))
+            self.dropped = InvalidationBatch(self)
+            self.dropped_lock = threading.Lock()
+
+            self.local_enable = env.bool("BACKEND_CACHE_L1_ENABLE", default=False)
+            self.local = LocalCache(
+                max_size=env.int("BACKEND_CACHE_L1_SIZE", default=1024),
+                timeout=env.int("BACKEND_CACHE_L1_TIMEOUT", default=30),
+            )
+            self.generations = LocalCache(
+                max_size=env.int("BACKEND_CACHE_L1_SIZE", default=1024),
+                timeout=env.int("BACKEND_CACHE_GENERATION_TIMEOUT", default=5),
+            )
+            self.bus = InvalidationBus(self.drop_local)
+            self.memo = Memoizer(self)
+            self.shards = ShardRing()
+            self.tags = TagIndex(self.breaker, self.shards)
+            self.loader = BatchLoader(self)
+            self.fragments = FragmentCache(self)
+            self.pool = None
+            self.pool_pid = None
+            self.pool_lock = threading.Lock()
+
+    def count(self, model, operation, result):
+        self.metrics.inc('followme_cache_operations_total',
+                         {'model': model, 'operation': operation, 'result': result})
+
+    def observe_stale(self, model, age):
+        self.count(model, 'get', 'stale')
+        self.metrics.observe('followme_cache_stale_seconds', {'model': model}, age, AGE_BUCKETS)
+        logging.debug(f"[CACHE]: served {model} entry {age:.1f}s past its soft TTL")
+
+    def watch_breaker(self, state):
+        self.metrics.inc('followme_cache_breaker_transitions_total', {'state': state})
+        if state == CircuitBreaker.CLOSED:
+            self.submit(self.replay_invalidation)
+
+    def drop_invalidation(self, pairs, tags=(), keys=()):
+        """
+        Keeps invalidations that could not reach Redis to replay them once
+        the circuit closes. Row tags are widened to model-wide generation
+        bumps, which keeps the backlog bounded by the number of models.
+        """
+        wide = set()
+        kept = set()
+        for tag in tags:
+            model = tag.split('.', 1)[0]
+            if model in self.invalidation:
+                wide.update((model_dep, '*') for model_dep in self.invalidation[model])
+            else:
+                kept.add(tag)
 
-    def clear(self, model, account, suffix='list'):
-        if suffix == '':
-            keys_pattern = f"followme.cache.{account}.{model}.*"
-        else:
-            keys_pattern = f"followme.cache.{account}.{model}.{suffix}.*"
-        keys = cache.keys(keys_pattern)
-
-        cache.delete_many(keys=keys)
+        with self.dropped_lock:
+            self.dropped.update(set(pairs) | wide, kept, keys)
 
-    def get(self, model, request, pk=''):
-        key = self.get_cache_key(model, request, pk)
-        return cache.get(key)
+    def replay_invalidation(self):
+        with self.dropped_lock:
+            dropped, self.dropped = self.dropped, InvalidationBatch(self)
 
-    def set(self, model, data, timeout, request, pk=''):
-        key = self.get_cache_key(model, request, pk)
-        return cache.set(key, data, timeout)
+        if dropped.pairs or dropped.tags or dropped.keys:
+            logging.warning(f"[CACHE]: replaying {len(dropped.pairs)} invalidations missed while Redis was unreachable")
+            dropped()
 
-    def get_account(sel, request):
+    def publish(self, *keys):
         try:
-            auth_header = request.headers.get('Authorization')
-            token_key = auth_header.split()[1]
-            token = Token.objects.get(key=token_key)
-
-            if token.user.profile.context_account:
-                return token.user.profile.context_account.id
-            else:
-                raise Exception("Fail to detect user context account")
-
+            with self.breaker:
+                self.bus.publish(*keys)
+        except CACHE_ERRORS:
+            # Other workers drop their L1 copies when their generation memo
+            # expires, as they cannot reach Redis either.
+            pass
+
+    def submit(self, func, *args):
+        """
+        Runs func on this process' background refresh pool.
+        """
+        if self.pool_pid != os.getpid():
+            with self.pool_lock:
+                if self.pool_pid != os.getpid():
+                    self.pool = ThreadPoolExecutor(
+                        max_workers=env.int("BACKEND_CACHE_REFRESH_WORKERS", default=2),
+                        thread_name_prefix='cache-refresh',
+                    )
+                    self.pool_pid = os.getpid()
+        return self.pool.submit(func, *args)
+
+    def get_stats(self):
+        """
+        Returns the L1/L2 hits and misses of every worker, per model.
+        """
+        stats = {}
+        for sample, value in self.metrics.collect().items():
+            name, labels = self.metrics.parse_sample(sample)
+            if name != 'followme_cache_operations_total' or labels['operation'] != 'get':
+                continue
+            stats.setdefault(labels['model'], Counter())[labels['result']] += value
+
+        for counters in stats.values():
+            l1_total = counters['l1_hit'] + counters['l1_miss']
+            l2_total = counters['l2_hit'] + counters['l2_miss']
+            counters['l1_ratio'] = counters['l1_hit'] / l1_total if l1_total else 0.0
+            counters['l2_ratio'] = counters['l2_hit'] / l2_total if l2_total else 0.0
+        return stats
+
+    def drop_local(self, key):
+        """
+        Drops a memoized generation, an L1 entry or a memoized result of this
+        worker.
+        """
+        if key is None:
+            self.generations.clear()
+            self.memo.local.clear()
+        else:
+            self.generations.delete(key)
+            self.local.delete(key)
+            self.memo.local.delete(key)
+
+    def get_generation_key(self, model, account):
+        return f"followme.generation.{account}.{model}"
+
+    def get_generation(self, model, account):
+        """
+        Returns the namespace version of a model for an account.
+
+        Keys are versioned by two counters: the model-wide one (account '*')
+        and the account one, so both kinds of invalidation are a single INCR.
+        """
+        keys = [
+            self.get_generation_key(model, '*'),
+            self.get_generation_key(model, account),
+        ]
+        generations = {}
+
+        if self.local_enable:
+            # Generations are memoized briefly and dropped on pub/sub
+            # broadcasts, so a warm L1 hit does not touch Redis at all.
+            self.bus.start()
+            for key in keys:
+                value = self.generations.get(key)
+                if value is not None:
+                    generations[key] = value
+
+        missing = [key for key in keys if key not in generations]
+        if missing:
+            # Raises CacheUnavailable while the breaker is open: without the
+            # generation no key can be trusted, so callers use the database.
+            with self.breaker:
+                generations.update(self.shards.get_many(missing))
+
+                for key in keys:
+                    if key not in generations:
+                        # Seed with a timestamp so an evicted counter never restarts
+                        # at a value that older entries may still be stored under.
+                        node = self.shards.get_cache(key)
+                        node.add(key, time.time_ns() // 1000, None)
+                        generations[key] = node.get(key)
+
+        if self.local_enable:
+            for key in missing:
+                self.generations.set(key, generations[key])
+
+        return f"{generations[keys[0]]}.{generations[keys[1]]}"
+
+    def clear(self, model, account):
+        key = self.get_generation_key(model, account)
+        try:
+            with self.metrics.timer('clear', model), self.breaker:
+                node = self.shards.get_cache(key)
+                try:
+                    node.incr(key)
+                except ValueError:
+                    node.add(key, time.time_ns() // 1000, None)
+        finally:
+            # Dropped even when Redis failed, so this worker stops serving
+            # its L1 entries of the old generation.
+            if self.local_enable:
+                self.drop_local(key)
+
+        if self.local_enable:
+            self.publish(key)
+
+    def delete(self, key):
+        try:
+            with self.breaker:
+                self.shards.get_cache(key).delete(key)
+        finally:
+            if self.local_enable:
+                self.drop_local(key)
+
+        if self.local_enable:
+            self.publish(key)
+
+    def evict(self, tags):
+        with self.metrics.timer('evict', '*'):
+            keys = self.tags.evict(tags)
+
+        evicted = Counter(self.get_key_model(key) for key in keys)
+        for model, count in evicted.items():
+            self.metrics.observe('followme_cache_invalidated_keys', {'model': model}, count, KEYS_BUCKETS)
+
+        if keys and self.local_enable:
+            for key in keys:
+                self.drop_local(key)
+            self.publish(*keys)
+        return keys
+
+    def get(self, model, request, pk='', local=False):
+        return self.load(self.get_cache_key(model, request, pk), local, model)
+
+    def set(self, model, data, timeout, request, pk='', local=False):
+        return self.store(self.get_cache_key(model, request, pk), data, timeout, local, model)
+
+    def get_key_model(self, key):
+        # followme.cache.{account}.{model}.{generation}...
+        parts = key.split('.')
+        return parts[3] if len(parts) > 3 else '*'
+
+    def load(self, key, local=False, model=None):
+        local = local and self.local_enable
+        model = model or self.get_key_model(key)
+
+        if local:
+            data = self.local.get(key)
+            self.count(model, 'get', 'l1_hit' if data is not None else 'l1_miss')
+            if data is not None:
+                return data
+
+        with self.metrics.timer('get', model), self.breaker:
+            data = self.shards.get_cache(key).get(key)
+        self.count(model, 'get', 'l2_hit' if data is not None else 'l2_miss')
+
+        if local and data is not None:
+            self.local.set(key, data)
+        return data
+
+    def store(self, key, data, timeout, local=False, model=None):
+        model = model or self.get_key_model(key)
+
+        if local and self.local_enable:
+            self.local.set(key, data, min(timeout, self.local.timeout))
+
+        if isinstance(data, CacheEntry):
+            self.metrics.inc('followme_cache_stored_bytes_total', {'model': model}, len(data.content))
+
+        with self.metrics.timer('set', model), self.breaker:
+            return self.shards.get_cache(key).set(key, data, timeout)
+
+    def get_lock(self, key, timeout):
+        """
+        Returns the recompute lock of a cache key. It expires after timeout,
+        so a worker that dies while holding it never blocks the key.
+        """
+        return self.shards.get_cache(key).lock(f"{key}.lock", timeout=timeout)
+
+    def get_account(self, request):
+        try:
+            return self.account_resolver.resolve(request)
         except Exception as e:
             raise Exception(f"Fail to detect user context account. Error: {str(e)}")
 
-    def get_cache_key(self, model, request, pk=''):
-        hashPath = hashlib.sha1(repr(request.path).encode()).hexdigest()
-        hashQuery = hashlib.sha1(repr(request.query_params).encode()).hexdigest()
+    def get_cache_key(self, model, request, pk='', params=None, scope=''):
+        """
+        Returns the key of a response. params are the canonical query
+        parameters (see ModelViewSetCached.get_cache_params); without them
+        every parameter is kept, sorted, with its last value. scope narrows
+        the entry to part of the account (see ModelViewSetCached.cache_scope).
+        """
+        if params is None:
+            params = sorted((name, request.query_params.getlist(name)[-1]) for name in request.query_params)
+
+        query = '&'.join(f"{name}={value}" for name, value in params)
+        media = getattr(request, 'accepted_media_type', '')
+        digest = xxhash.xxh3_128_hexdigest(f"{request.path}\n{query}\n{media}\n{scope}")
+
         account = self.get_account(request)
+        generation = self.get_generation(model, account)
 
         if (pk != ''):
-            key = f"followme.cache.{account}.{model}.{pk}.{hashPath}.{hashQuery}"
+            key = f"followme.cache.{account}.{model}.{generation}.{pk}.{digest}"
         else:
-            key = f"followme.cache.{account}.{model}.list.{hashPath}.{hashQuery}"
+            key = f"followme.cache.{account}.{model}.{generation}.list.{digest}"
         return key
 
-    def bind_model(self, model_root, model_class):
-        try:
-            post_save.connect(self.watch_clear_cache, sender=model_class)
-            post_delete.connect(self.watch_clear_cache_delete, sender=model_class)
+    def register(self, viewset):
+        """
+        Records a ModelViewSetCached subclass. Viewsets are bound when the
+        graph is frozen at startup (UtilsConfig.ready); late ones right away.
+        """
+        self.viewsets.append(viewset)
+
+        if self.frozen:
+            self.bind_viewset(viewset)
+            self.freeze()
+
+    def bind_viewset(self, viewset):
+        if getattr(viewset, 'serializer_class', None) is not None:
+            model_class = viewset.serializer_class.Meta.model
+        elif getattr(viewset, 'cache_model_class', None) is not None:
+            model_class = viewset.cache_model_class
+        else:
+            raise ValueError(f'Fail: Cache model undefined for {viewset.__name__}')
 
-            for field in model_class._meta.get_fields():
-                if isinstance(field, models.ForeignKey):
-                    self.bind_related_model(model_root, model_class, field.related_model)
-        except Exception as e:
-            logging.error(f"Fail to bind watch model in cache. Error: {e}")
+        viewset.cache_model = model_class.__name__
+        viewset.cache_manager = self
+        self.bind_model(viewset.cache_model, model_class)
 
-    def bind_related_model(self, model, model_class, related_model=None):
+        if isinstance(getattr(viewset, 'cache_related_model_classes', None), list):
+            for related_model in viewset.cache_related_model_classes:
+                self.bind_model(viewset.cache_model, related_model)
+                self.bind_related_model(viewset.cache_model, model_class, related_model,
+                                        loose=not self.is_one_to_one(model_class, related_model))
+
+    def bind_model(self, model_root, model_class):
+        self.add_model(model_class)
+
+        for field in model_class._meta.get_fields():
+            if isinstance(field, models.ForeignKey):
+                self.bind_related_model(model_root, model_class, field.related_model)
+
+    def is_one_to_one(self, model_class, related_model):
+        # Rows joined one-to-one, either way, are tagged by get_instance_tags.
+        return any(
+            field.one_to_one and field.related_model is related_model
+            for field in model_class._meta.get_fields()
+        )
+
+    def bind_related_model(self, model, model_class, related_model=None, loose=False):
+        """
+        Records that the cache of model embeds related_model. Loose relations
+        (cache_related_model_classes not joined one-to-one) are not reachable
+        through a foreign key of the cached rows, so their writes cannot be
+        row-targeted.
+        """
+        self.add_model(model_class)
+        self.add_model(related_model)
+
+        related_name = related_model.__name__
+        self.model_relation[model]["dependend"].add(related_name)
+        self.model_relation[related_name]["dependency"].add(model)
+
+        if loose:
+            self.model_relation[related_name]["loose"].add(model)
+
+    def add_model(self, model_class):
+        name = model_class.__name__
+        if name in self.model_classes:
+            return
+
+        self.model_classes[name] = model_class
+        self.model_relation.setdefault(name, {
+            "dependend": set(),
+            "dependency": set(),
+            "loose": set(),
+        })
+
+        account_field = None
+        for field in model_class._meta.get_fields():
+            if field.name == 'account':
+                account_field = getattr(field, 'attname', field.name)
+        self.account_fields[name] = account_field
+
+    def freeze(self):
+        """
+        Binds every registered viewset, then freezes the models each write
+        invalidates: the model itself, the models it references, and every
+        model whose cache depends on it, directly or transitively.
+        Receivers are connected once per model.
+        """
+        if not self.frozen:
+            for viewset in self.viewsets:
+                self.bind_viewset(viewset)
+
+        invalidation = {}
+        for model, relation in self.model_relation.items():
+            invalidation[model] = frozenset({model} | relation["dependend"] | self.get_dependency(model))
+
+        # An update of one row evicts the entries tagged with it and the
+        # filtered lists of every model embedding it through foreign keys.
+        # Models embedding it loosely still get their generation bumped.
+        row_invalidation = {}
+        for model in self.model_relation:
+            embedding = {model}
+            generation = set()
+            pending = [model]
+            while pending:
+                current = pending.pop()
+                relation = self.model_relation[current]
+                for model_dep in relation["dependency"]:
+                    if model_dep in relation["loose"]:
+                        generation.add(model_dep)
+                        generation.update(self.get_dependency(model_dep))
+                    elif model_dep not in embedding:
+                        embedding.add(model_dep)
+                        pending.append(model_dep)
+
+            row_invalidation[model] = (frozenset(embedding), frozenset(generation))
+
+        self.invalidation = invalidation
+        self.row_invalidation = row_invalidation
+        self.frozen = True
+
+        for name, model_class in self.model_classes.items():
+            post_save.connect(self.watch_clear_cache, sender=model_class,
+                              dispatch_uid=f'cache_clear_save_{model_class._meta.label}')
+            post_delete.connect(self.watch_clear_cache_delete, sender=model_class,
+                                dispatch_uid=f'cache_clear_delete_{model_class._meta.label}')
+
+        self.loader.freeze()
+
+    def get_dependency(self, model):
+        dependency = set()
+        pending = [model]
+        while pending:
+            for model_dep in self.model_relation[pending.pop()]["dependency"]:
+                if model_dep not in dependency:
+                    dependency.add(model_dep)
+                    pending.append(model_dep)
+        return dependency
+
+    def get_instance_tags(self, instances):
+        """
+        Returns the row tags of the given instances and of every cached
+        related row reachable from them through foreign keys.
+        """
+        tags = set()
+        seen = set()
+        pending = list(instances)
+
+        while pending:
+            instance = pending.pop()
+            tags.add(f"{type(instance).__name__}.{instance.pk}")
+
+            for field in instance._meta.concrete_fields:
+                if not field.many_to_one and not field.one_to_one:
+                    continue
+                if field.related_model.__name__ not in self.model_classes:
+                    continue
+
+                value = getattr(instance, field.attname)
+                if value is None:
+                    continue
+
+                tags.add(f"{field.related_model.__name__}.{value}")
+                if field.is_cached(instance):
+                    related = field.get_cached_value(instance)
+                    if related is not None and id(related) not in seen:
+                        seen.add(id(related))
+                        pending.append(related)
+
+            # Reverse one-to-one rows embedded in the entry (User.profile).
+            for relation in instance._meta.related_objects:
+                if not relation.one_to_one or not relation.is_cached(instance):
+                    continue
+                related = relation.get_cached_value(instance)
+                if related is not None and id(related) not in seen:
+                    seen.add(id(related))
+                    pending.append(related)
+
+        return tags
+
+    def get_instance_account(self, sender, instance):
+        account_field = self.account_fields.get(sender.__name__)
+        if account_field is None:
+            return '*'
+        return getattr(instance, account_field)
+
+    def watch_clear_cache(self, sender, instance, created, using=DEFAULT_DB_ALIAS, raw=False, **kwargs):
+        account = self.get_instance_account(sender, instance)
+
+        if created or raw:
+            self.clear_cache_tree_by_account(sender.__name__, account, using)
+        else:
+            self.clear_cache_row(sender.__name__, instance.pk, account, using)
+
+    def watch_clear_cache_delete(self, sender, instance, using=DEFAULT_DB_ALIAS, **kwargs):
+        account = self.get_instance_account(sender, instance)
+        self.clear_cache_tree_by_account(sender.__name__, account, using)
+
+    def clear_cache_tree_by_account(self, model, account, using=DEFAULT_DB_ALIAS):
+        self.invalidate({(model_dep, account) for model_dep in self.invalidation.get(model, (model,))}, using)
+
+    def clear_cache_row(self, model, pk, account, using=DEFAULT_DB_ALIAS):
+        """
+        Invalidates what an update of a single row can change: entries
+        containing that row and filtered lists that could now match it.
+        """
+        embedding, generation = self.row_invalidation.get(model, ((model,), ()))
+        tags = {f"{model}.{pk}"} | {f"{model_dep}.filtered" for model_dep in embedding}
+        self.invalidate({(model_dep, account) for model_dep in generation}, using, tags)
+
+    def invalidate(self, pairs, using=DEFAULT_DB_ALIAS, tags=(), keys=()):
+        """
+        Invalidates (model, account) pairs and evicts tagged keys and plain
+        keys once the current transaction commits, or right away in
+        autocommit mode. They are deduplicated per transaction and dropped
+        if it rolls back.
+        """
+        suspended = getattr(self.pending, 'suspended', None)
+        if suspended is not None:
+            suspended.update(pairs, tags, keys)
+            return
+
+        self.batches.add(using, pairs, tags, keys)
+
+    def apply_invalidation(self, pairs, tags=(), keys=()):
+        try:
+            with self.metrics.timer('cascade', '*'):
+                for model, account in pairs:
+                    self.clear(model, account)
+
+                if tags:
+                    self.evict(tags)
+
+                if keys:
+                    with self.breaker:
+                        self.shards.delete_many(keys)
+        except CACHE_ERRORS:
+            self.drop_invalidation(pairs, tags, keys)
+
+    @contextmanager
+    def suspend_invalidation(self, using=DEFAULT_DB_ALIAS):
+        """
+        Collects every invalidation raised inside the block (e.g. a bulk
+        import) and applies the deduplicated set once when it exits.
+        """
+        if getattr(self.pending, 'suspended', None) is not None:
+            yield
+            return
+
+        self.pending.suspended = InvalidationBatch(self)
         try:
-            related_name = related_model.__name__
+            yield
+        finally:
+            batch = self.pending.suspended
+            self.pending.suspended = None
+            self.invalidate(batch.pairs, using, batch.tags, batch.keys)
 
-            if model not in self.model_relation:
-                self.model_relation[model] = {
-                    "dependend": [],
-                    "dependency": [],
-                }
+    def clear_cache_tree(self, model, request):
+        account = self.get_account(request)
+        self.clear_cache_tree_by_account(model, account)
 
-            if related_name not in self.model_relation:
-                self.model_relation[related_name] = {
-                    "dependend": [],
-                    "dependency": [],
-                }
+class ModelViewSetCached(ModelViewSet):
+    """
+    ModelViewSet whose list/retrieve responses are cached per account.
+
+    Subclasses are registered on definition; their cache model and
+    dependency graph are bound once at startup by UtilsConfig.ready().
+    """
+    cache_enable = CACHE_ENABLE
+    cache_timeout = env.int("BACKEND_CACHE_TIMEOUT", default=60)
+
+    # Keep responses in the per-worker L1 tier as well (BACKEND_CACHE_L1_ENABLE)
+    cache_local = False
+
+    # Single-flight on misses: lock lifetime, how long other requests wait
+    # for the lock holder, and how often they poll the cache meanwhile.
+    cache_lock_timeout = env.int("BACKEND_CACHE_LOCK_TIMEOUT", default=30)
+    cache_lock_wait = env.float("BACKEND_CACHE_LOCK_WAIT", default=2.0)
+    cache_lock_interval = 0.05
+
+    # Stale-while-revalidate: after this many seconds (soft TTL) entries are
+    # still served but refreshed in the background, until cache_timeout
+    # (hard TTL) evicts them. None disables it.
+    cache_stale_timeout = None
+
+    # Who shares an entry within the account: None (everyone), 'permission'
+    # (users whose module permissions are the same) or 'user'.
+    cache_scope = None
+
+    # Replayed by the warm_cache command and the boot hook: the list, the
+    # list filtered by every value of these params, and retrieves.
+    cache_warm = False
+    cache_warm_filters = ()
+
+    # What get_cache_params reads from the filter backends, set on each
+    # class by its first request (get_cache_param_spec).
+    cache_param_spec = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        CacheManager().register(cls)
 
-            if related_name not in self.model_relation[model]["dependend"]:
-                self.model_relation[model]["dependend"].append(related_name)
+    def list(self, request):
+        if self.cache_enable:
+            return self.cached_response('list', request)
+        else:
+            return super().list(request)
 
-            if model not in self.model_relation[related_name]["dependency"]:
-                self.model_relation[related_name]["dependency"].append(model)
+    def retrieve(self, request, pk=None):
+        if self.cache_enable:
+            return self.cached_response('retrieve', request, pk)
+        else:
+            return super().retrieve(request, pk)
 
-            post_save.connect(self.watch_clear_cache, sender=related_model)
-            post_save.connect(self.watch_clear_cache, sender=model_class)
+    def compute_response(self, action, request, pk=None):
+        # Filled by the fragments the page is assembled from (FragmentCache).
+        self.cache_fragment_tags = set()
+        if action == 'retrieve':
+            return super().retrieve(request, pk)
+        return super().list(request)
 
-            post_delete.connect(self.watch_clear_cache_delete, sender=related_model)
-            post_delete.connect(self.watch_clear_cache_delete, sender=model_class)
+    def cached_response(self, action, request, pk=None):
+        start = time.perf_counter()
+        self.cache_result = 'miss'
 
-        except Exception as e:
-            logging.error(f"Fail to bind related model in cache. Error: {e}")
+        response = self.load_response(action, request, pk)
 
-    def watch_clear_cache(self, sender, instance, created, **kwargs):
-        account = '*'
-        if "account" in [f.name for f in instance._meta.get_fields()]:
-            account = instance.account.id
+        self.cache_manager.metrics.observe('followme_cache_operation_seconds',
+                                           {'model': self.cache_model,
+                                            'operation': action,
+                                            'result': self.cache_result},
+                                           time.perf_counter() - start)
+        return response
 
-        self.clear_cache_tree_by_account(sender.__name__, account)
+    def load_response(self, action, request, pk=None):
+        """
+        Serves a response from the cache, or computes and stores it.
 
-    def watch_clear_cache_delete(self, sender, instance, **kwargs):
-        account = '*'
-        if "account" in [f.name for f in instance._meta.get_fields()]:
-            account = instance.account.id
+        Misses are single-flight: only the worker holding the key lock runs
+        the query, the others poll the cache for up to cache_lock_wait
+        seconds and then fall back to computing it themselves. While the
+        circuit breaker is open the database is queried right away.
+        """
+        try:
+            key = self.cache_manager.get_cache_key(self.cache_model, request, pk or '',
+                                                   self.get_cache_params(request),
+                                                   self.get_cache_scope(request))
+            entry = self.cache_manager.load(key, self.cache_local, self.cache_model)
+            if entry is not None:
+                return self.entry_response(action, request, key, entry, pk)
+        except CacheUnavailable:
+            return self.bypass_response(action, request, pk)
+        except Exception as e:
+            logging.error(f"""
+                [CACHE ERROR]: ({action}): {self.cache_model} model using cache.
+                [ERROR]: {e}"""
+            )
+            return self.compute_response(action, request, pk)
 
-        self.clear_cache_tree_by_account(sender.__name__, account)
+        lock = None
+        try:
+            lock = self.cache_manager.get_lock(key, self.cache_lock_timeout)
+            with self.cache_manager.breaker:
+                acquired = lock.acquire(blocking=False)
+            if not acquired:
+                entry = self.wait_cached_entry(key, lock)
+                if entry is not None:
+                    return self.entry_response(action, request, key, entry, pk)
+                lock = None
+        except CacheUnavailable:
+            return self.bypass_response(action, request, pk)
+        except Exception as e:
+            logging.error(f"""
+                [CACHE ERROR]: ({action}): {self.cache_model} model using cache lock.
+                [ERROR]: {e}"""
+            )
+            lock = None
 
-    def clear_cache_tree_by_account(self, model, account):
-        if model in self.model_relation:
-            for model_dep in self.model_relation[model]['dependend']:
-                self.clear(model_dep, account, '')
+        try:
+            return self.store_response(action, request, key, pk)
+        finally:
+            if lock is not None:
+                try:
+                    lock.release()
+                except Exception:
+                    # The lock expired while computing; somebody else owns it now.
+                    pass
+
+    def get_cache_params(self, request):
+        """
+        Returns the query parameters that can change the response, in
+        canonical form: sorted, one value each, parameters that no filter
+        backend or the paginator reads dropped, and the page, page size
+        and ordering defaults filled in. Requests differing only in those
+        share one entry.
+        """
+        query = request.query_params
+        params = {}
+        defaults = {}
+        spec = self.get_cache_param_spec(request)
+
+        if spec['search'] is not None:
+            terms = spec['search'].get_search_terms(request)
+            if terms:
+                # Every term must match, so their order does not matter.
+                params[spec['search'].search_param] = ' '.join(sorted(set(terms)))
+
+        if spec['ordering'] is not None:
+            param, valid, default = spec['ordering']
+            # Invalid fields are dropped as OrderingFilter.get_ordering does.
+            ordering = [term.strip() for term in query.get(param, '').split(',')]
+            ordering = [term for term in ordering if (term[1:] if term.startswith('-') else term) in valid]
+            ordering = ordering or default
+            if ordering:
+                params[param] = ','.join(ordering)
+                defaults[param] = ','.join(default)
+
+        for name, multiple in spec['filters'].items():
+            for param in query:
+                # Range style filters read suffixed parameters (name_min, name_max).
+                if param != name and not param.startswith(f"{name}_"):
+                    continue
+                values = query.getlist(param)
+                if multiple:
+                    params[param] = ','.join(sorted(set(values)))
+                else:
+                    params[param] = values[-1]
+
+        if spec['any']:
+            # A backend we cannot reason about may read any parameter.
+            params.update((param, ','.join(query.getlist(param))) for param in query)
+
+        paginator = self.paginator
+        if self.action == 'list' and paginator is not None:
+            if isinstance(paginator, PageNumberPagination):
+                page = query.get(paginator.page_query_param, '1')
+                if page not in paginator.last_page_strings:
+                    try:
+                        page = str(int(page))
+                    except ValueError:
+                        pass
+                params[paginator.page_query_param] = page
+                params[paginator.page_size_query_param or 'page_size'] = str(paginator.get_page_size(request))
+                defaults[paginator.page_query_param] = '1'
+                defaults[paginator.page_size_query_param or 'page_size'] = str(paginator.page_size)
+            else:
+                for attr in ('limit_query_param', 'offset_query_param', 'cursor_query_param'):
+                    param = getattr(paginator, attr, None)
+                    if param in query:
+                        params[param] = query[param]
+
+        params = sorted(params.items())
+
+        # A request is a collapsed duplicate unless it already is the
+        # shortest canonical form: sorted and without explicit defaults.
+        raw = [(param, value) for param in query for value in query.getlist(param)]
+        shortest = [(param, value) for param, value in params if defaults.get(param) != value]
+        self.cache_manager.count(self.cache_model, 'key', 'collapsed' if raw != shortest else 'canonical')
+        return params
+
+    def get_cache_param_spec(self, request):
+        """
+        Returns what get_cache_params reads from the filter backends: the
+        search backend, the ordering parameter with its valid fields and
+        default, the FilterSet filters with their multi-value flag, and
+        whether a backend may read any parameter. Built on the first request
+        of each viewset class and kept on it, instead of instantiating the
+        backends and building the FilterSet class on every request.
+        """
+        spec = type(self).__dict__.get('cache_param_spec')
+        if spec is not None:
+            return spec
+
+        spec = {'search': None, 'ordering': None, 'filters': {}, 'any': False}
+        for backend_class in self.filter_backends:
+            backend = backend_class()
+
+            if isinstance(backend, filters.SearchFilter):
+                if backend.get_search_fields(self, request):
+                    spec['search'] = backend
+            elif isinstance(backend, filters.OrderingFilter):
+                valid = backend.get_valid_fields(self.get_queryset(), self, {'request': request})
+                spec['ordering'] = (
+                    backend.ordering_param,
+                    frozenset(name for name, _ in valid),
+                    list(backend.get_default_ordering(self) or ()),
+                )
+            elif hasattr(backend, 'get_filterset_class'):
+                filterset_class = backend.get_filterset_class(self, self.get_queryset())
+                for name, filter_ in getattr(filterset_class, 'base_filters', {}).items():
+                    spec['filters'][name] = getattr(filter_.field_class.widget, 'allow_multiple_selected', False)
+            else:
+                spec['any'] = True
+
+        type(self).cache_param_spec = spec
+        return spec
+
+    def get_cache_scope(self, request):
+        """
+        Returns the part of the key separating users of an account. Module
+        permissions only depend on the admin flags and the permission
+        profile, so users sharing them share entries.
+        """
+        if self.cache_scope == 'user':
+            return f"user.{request.user.pk}"
+
+        if self.cache_scope == 'permission':
+            from apps.permission.context import get_authorization
+            authorization = get_authorization(request)
+            if authorization.has_full_permission():
+                return 'admin'
+            return f"permission.{getattr(authorization.profile, 'permission_id', None)}"
+
+        return ''
+
+    def bypass_response(self, action, request, pk=None):
+        self.cache_result = 'bypass'
+        self.cache_manager.count(self.cache_model, 'get', 'bypass')
+        return self.compute_response(action, request, pk)
+
+    def get_serializer(self, *args, **kwargs):
+        if args:
+            self.cache_instances = args[0]
+        return super().get_serializer(*args, **kwargs)
+
+    def get_cache_tags(self, action, request):
+        """
+        Tags an entry with the rows it contains. Lists narrowed by search,
+        filters or ordering are also tagged '<model>.filtered' for every
+        model they embed, since an update may change which rows match.
+        """
+        instances = getattr(self, 'cache_instances', None)
+        if instances is None:
+            instances = []
+        elif not isinstance(instances, (list, tuple, models.QuerySet)):
+            instances = [instances]
+
+        tags = self.cache_manager.get_instance_tags(instances)
+        tags.update(getattr(self, 'cache_fragment_tags', None) or ())
+
+        if action == 'list':
+            ignored = {'format'}
+            if self.paginator is not None:
+                ignored.update(filter(None, [
+                    getattr(self.paginator, 'page_query_param', None),
+                    getattr(self.paginator, 'page_size_query_param', None),
+                ]))
+
+            if any(param not in ignored for param in request.query_params):
+                tags.update(f"{model}.filtered" for model in self.cache_manager.invalidation[self.cache_model])
+
+        return tags
+
+    def store_response(self, action, request, key, pk=None):
+        try:
+            mark = self.cache_manager.tags.get_mark()
+        except CACHE_ERRORS:
+            return self.bypass_response(action, request, pk)
+        response = self.compute_response(action, request, pk)
+
+        # Only JSON bodies are cached; the browsable API needs the full
+        # response context and is not worth caching.
+        if response.status_code != 200 or not isinstance(request.accepted_renderer, JSONRenderer):
+            return response
 
-            for model_dep in self.model_relation[model]['dependency']:
-                self.clear(model_dep, account, '')
+        try:
+            entry = self.render_entry(request, response)
+        except Exception as e:
+            logging.error(f"""
+                [CACHE ERROR]: ({action}): {self.cache_model} model rendering cache.
+                [ERROR]: {e}"""
+            )
+            return response
 
-        self.clear(model, account, '')
+        try:
+            # Tagged before it is stored, so it is never left unevictable.
+            tags = self.get_cache_tags(action, request)
+            self.cache_manager.tags.add(key, tags, self.cache_timeout)
+            self.cache_manager.store(key, entry, self.cache_timeout, self.cache_local, self.cache_model)
+
+            if self.cache_manager.tags.get_stale(tags, mark):
+                # A row was evicted while computing; the result may be stale.
+                self.cache_manager.delete(key)
+        except CacheUnavailable:
+            pass
+        except Exception as e:
+            logging.error(f"""
+                [CACHE ERROR]: ({action}): {self.cache_model} model using cache.
+                [ERROR]: {e}"""
+            )
 
-    def clear_cache_tree(self, model, request):
-        account = self.get_account(request)
-        self.clear_cache_tree_by_account(model, request)
+        return self.build_response(request, entry)
 
-class ModelViewSetCached(ModelViewSet):
-    def __init__(self, *args, **kwargs):
-        env = environ.Env()
+    def render_entry(self, request, response):
+        renderer = request.accepted_renderer
+        context = self.get_renderer_context()
+        context['response'] = response
 
-        if env.str("BACKEND_CACHE_TIMEOUT") is None:
-            self.cache_timeout = 60
-        else:
-            self.cache_timeout = env.int("BACKEND_CACHE_TIMEOUT")
+        content = renderer.render(response.data, request.accepted_media_type, context)
 
-        if env.bool("BACKEND_CACHE_ENABLE") == True:
-            self.cache_enable = True
-        else:
-            self.cache_enable = False
+        content_type = request.accepted_media_type
+        if renderer.charset:
+            content_type = f"{content_type}; charset={renderer.charset}"
 
-        self.cache_manager = CacheManager()
+        return CacheEntry.from_content(content, content_type)
 
-        if hasattr(self, 'serializer_class'):
-            self.cache_model = self.serializer_class.Meta.model.__name__
-            self.cache_manager.bind_model(self.cache_model, self.serializer_class.Meta.model)
-        else:
-            if hasattr(self, 'cache_model_class'):
-                self.cache_model = self.cache_model_class.__name__
-                self.cache_manager.bind_model(self.cache_model, self.cache_model_class)
+    def build_response(self, request, entry):
+        content, encoding = entry.get_content(request.META.get('HTTP_ACCEPT_ENCODING', ''))
 
-            else: 
-                raise ValueError('Fail: Cache model undefined')
+        response = HttpResponse(content, content_type=entry.content_type)
+        if encoding:
+            response['Content-Encoding'] = encoding
+        patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+        return response
 
-        if hasattr(self, 'cache_related_model_classes'):
-            if isinstance(self.cache_related_model_classes, list):
-                for related_model in self.cache_related_model_classes:
-                    self.cache_manager.bind_model(self.cache_model, related_model)
+    def wait_cached_entry(self, key, lock):
+        deadline = time.monotonic() + self.cache_lock_wait
 
-        super().__init__(*args, **kwargs)
+        while time.monotonic() < deadline:
+            time.sleep(self.cache_lock_interval)
 
-    def list(self, request):
-        if self.cache_enable:
-            try:
-                data = self.cache_manager.get(self.cache_model, request)
-                if data is not None:
-                    return Response(data)
-            except Exception as e:
-                logging.error(f"""
-                    [CACHE ERROR]: (list): {self.cache_model} model using cache.
-                    [ERROR]: {e}"""
-                )
+            entry = self.cache_manager.load(key, self.cache_local, self.cache_model)
+            if entry is not None:
+                return entry
 
-            response = super().list(request)
+            if not lock.locked():
+                # The holder finished without storing (error, non-200) or died.
+                return self.cache_manager.load(key, self.cache_local, self.cache_model)
 
-            try:
-                self.cache_manager.set(self.cache_model,
-                                       response.data,
-                                       self.cache_timeout,
-                                       request)
-            except Exception as e:
-                logging.error(f"""
-                    [CACHE ERROR]: (list): {self.cache_model} model using cache.
-                    [ERROR]: {e}"""
-                )
+        return None
 
-            return response
+    def entry_response(self, action, request, key, entry, pk=None):
+        response = self.build_response(request, entry)
+        self.cache_result = 'hit'
 
-        else:
-            return super().list(request)
+        if self.cache_stale_timeout is not None:
+            age = entry.get_age()
+            response['Age'] = str(int(age))
 
-    def retrieve(self, request, pk=None):
-        if self.cache_enable:
-            try:
-                data = self.cache_manager.get(self.cache_model, request, pk)
-                if data is not None:
-                    return Response(data)
-            
-            except Exception as e:
-                logging.error(f"""
-                    [CACHE ERROR]: (retrieve): {self.cache_model} model using cache.
-                    [ERROR]: {e}"""
-                )
+            if age > self.cache_stale_timeout:
+                self.cache_result = 'stale'
+                self.cache_manager.observe_stale(self.cache_model, age)
+                self.schedule_refresh(action, request, key, pk)
 
-            response = super().retrieve(request, pk)
+        return response
 
-            try:
-                self.cache_manager.set(self.cache_model, response.data, self.cache_timeout, request, pk)
-            except Exception as e:
-                logging.error(f"""
-                    [CACHE ERROR]: (retrieve): {self.cache_model} model using cache.
-                    [ERROR]: {e}"""
-                )
+    def schedule_refresh(self, action, request, key, pk=None):
+        try:
+            lock = self.cache_manager.get_lock(key, self.cache_lock_timeout)
+            with self.cache_manager.breaker:
+                acquired = lock.acquire(blocking=False)
+            if acquired:
+                self.cache_manager.submit(self.refresh_entry, action, request, key, lock, pk)
+        except CacheUnavailable:
+            pass
+        except Exception as e:
+            logging.error(f"""
+                [CACHE ERROR]: ({action}): {self.cache_model} model scheduling refresh.
+                [ERROR]: {e}"""
+            )
 
-            return response
+    def refresh_entry(self, action, request, key, lock, pk=None):
+        # Runs on the refresh pool after the stale response was returned, so
+        # it works on its own viewset instance and database connection.
+        view = type(self)()
+        view.request = request
+        view.args = self.args
+        view.kwargs = self.kwargs
+        view.format_kwarg = self.format_kwarg
+        view.action = self.action
+        view.headers = {}
 
-        else:
-            return super().retrieve(request, pk)
+        try:
+            view.store_response(action, request, key, pk)
+        except Exception as e:
+            logging.error(f"""
+                [CACHE ERROR]: ({action}): {self.cache_model} model refreshing cache.
+                [ERROR]: {e}"""
+            )
+        finally:
+            connections.close_all()
+            try:
+                lock.release()
+            except Exception:
+                pass
 
+    # Errors DRF renders itself (validation, permission, not found) keep
+    # their status and body; anything else becomes a 400.
     def create(self, request):
         try:
             response = super().create(request)
@@ -259,6 +1607,8 @@ class ModelViewSetCached(ModelViewSet):
                     [CACHE ERROR]: (create): {self.cache_model} model using cache.
                     [ERROR]: {e}"""
                 )
+        except (APIException, Http404):
+            raise
         except Exception as e:
             response = Response(data=str(e), status=400)
 
@@ -267,6 +1617,8 @@ class ModelViewSetCached(ModelViewSet):
     def destroy(self, request, pk):
         try:
             super().destroy(request, pk)
+        except (APIException, Http404):
+            raise
         except Exception as e:
             return Response(data=str(e), status=400)
 
@@ -280,17 +1632,12 @@ class ModelViewSetCached(ModelViewSet):
 
         return Response(status=204)
 
+    # Updates are invalidated row by row from the post_save receivers.
     def update(self, request, pk):
         try:
             response = super().update(request, pk)
-
-            try:
-                self.cache_manager.clear_cache_tree(self.cache_model, request)
-            except Exception as e:
-                logging.error(f"""
-                    [CACHE ERROR]: (update): {self.cache_model} model using cache.
-                    [ERROR]: {e}"""
-                )
+        except (APIException, Http404):
+            raise
         except Exception as e:
             response = Response(data=str(e), status=400)
 
@@ -299,14 +1646,8 @@ class ModelViewSetCached(ModelViewSet):
     def partial_update(self, request, pk):
         try:
             response = super().update(request, pk, partial=True)
-
-            try:
-                self.cache_manager.clear_cache_tree(self.cache_model, request)
-            except Exception as e:
-                logging.error(f"""
-                    [CACHE ERROR]: (partial_update): {self.cache_model} model using cache.
-                    [ERROR]: {e}"""
-                )
+        except (APIException, Http404):
+            raise
         except Exception as e:
             response = Response(data=str(e), status=400)
 
@@ -0,0 +1,92 @@
+import environ
+
+from django.core.cache import cache
+
+from .breaker import CACHE_ERRORS
+
+env = environ.Env()
+
+class FragmentCache:
+    """
+    Serialized representations of single rows, so a list page missing the
+    page cache only serializes the rows that changed.
+
+    A fragment is keyed by serializer, pk and the model-wide generation
+    (the row version), and stored and tagged with the rows it embeds, e.g.
+    'City.5', 'State.2' and 'Country.1'. The post_save receivers of CacheManager
+    evict those tags, so a write drops the fragments of the row itself and
+    of every row embedding it.
+    """
+    KEY_PREFIX = 'followme.fragment.tagged'
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.timeout = env.int("BACKEND_CACHE_FRAGMENT_TIMEOUT", default=86400)
+
+    def get_prefix(self, serializer):
+        model = serializer.Meta.model.__name__
+        generation = self.manager.get_generation(model, '*')
+        owner = type(serializer)
+        return f"{self.KEY_PREFIX}.{owner.__module__}.{owner.__qualname__}.{generation}"
+
+    def to_representation(self, serializer, instances, tags=None):
+        """
+        Returns the representation of every instance, reading the cached
+        fragments at once and serializing, then storing, only the misses.
+        The tags of every fragment are added to tags, so the page embedding
+        them is evicted along with them even when it was built from hits.
+        """
+        try:
+            prefix = self.get_prefix(serializer)
+            keys = [f"{prefix}.{instance.pk}" for instance in instances]
+            with self.manager.breaker:
+                mark = self.manager.tags.get_mark()
+                found = cache.get_many(keys)
+        except CACHE_ERRORS:
+            return self.serialize(serializer, instances)
+
+        model = serializer.Meta.model.__name__
+        missing = [(key, instance) for key, instance in zip(keys, instances) if key not in found]
+        self.manager.metrics.inc('followme_cache_operations_total',
+                                 {'model': model, 'operation': 'fragment', 'result': 'hit'},
+                                 len(keys) - len(missing))
+        self.manager.metrics.inc('followme_cache_operations_total',
+                                 {'model': model, 'operation': 'fragment', 'result': 'miss'},
+                                 len(missing))
+
+        if missing:
+            representations = self.serialize(serializer, [instance for _, instance in missing])
+            fragments = {
+                key: (representation, frozenset(self.manager.get_instance_tags([instance])))
+                for (key, instance), representation in zip(missing, representations)
+            }
+            found.update(fragments)
+            self.store(fragments, mark)
+
+        if tags is not None:
+            for key in keys:
+                tags.update(found[key][1])
+        return [found[key][0] for key in keys]
+
+    def serialize(self, serializer, instances):
+        loader = self.manager.loader
+        loader.load_related(instances, loader.get_tree(serializer))
+        return [serializer.to_representation(instance) for instance in instances]
+
+    def store(self, fragments, mark):
+        """
+        Stores {key: (representation, tags)}, each fragment with the tags of
+        every row it embeds.
+        """
+        try:
+            with self.manager.breaker:
+                # Tagged before they are stored, so none is left unevictable.
+                self.manager.tags.add_many({key: fragment[1] for key, fragment in fragments.items()}, self.timeout)
+                cache.set_many(fragments, self.timeout)
+
+                stale = self.manager.tags.get_stale(set().union(*(fragment[1] for fragment in fragments.values())), mark)
+                if stale:
+                    # A row was evicted while serializing; its fragments may be stale.
+                    cache.delete_many([key for key, fragment in fragments.items() if fragment[1] & stale])
+        except CACHE_ERRORS:
+            pass
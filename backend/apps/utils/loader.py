@@ -0,0 +1,245 @@
+import threading
+import environ
+
+from collections import defaultdict
+
+from django.db import DEFAULT_DB_ALIAS
+from django.core.exceptions import ImproperlyConfigured
+from django.core.cache import cache
+from django.db.models.signals import post_save
+from django.db.models.signals import post_delete
+from rest_framework import serializers
+
+from .breaker import CACHE_ERRORS
+
+env = environ.Env()
+
+class BatchLoader:
+    """
+    DataLoader style loader for the related rows nested serializers read.
+
+    Given the instances of a page and a relation tree such as
+    {'city': {'state': {'country': {}}}}, each level is resolved at once:
+    foreign keys pointing to the same model share one cache.get_many over
+    per-object entries and one pk__in query for the misses, reverse
+    one-to-one relations take one query. The loaded rows are set on the
+    relation caches, so serializing the page does not query them again.
+
+    With the cache disabled (BACKEND_CACHE_ENABLE) the rows are still
+    loaded in batches, straight from the database.
+    """
+    KEY_PREFIX = 'followme.object'
+
+    def __init__(self, manager):
+        self.manager = manager
+        # CACHE_ENABLE of apps.utils.cache, which imports this module.
+        self.enable = env.bool("BACKEND_CACHE_ENABLE", default=False)
+        self.timeout = env.int("BACKEND_CACHE_OBJECT_TIMEOUT", default=3600)
+        self.trees = {}
+        self.serializers = []
+        self.watched = set()
+        self.lock = threading.Lock()
+
+    def register(self, serializer_class):
+        self.serializers.append(serializer_class)
+
+    def freeze(self):
+        """
+        Watches, at startup, every model the registered serializers load, so
+        writes in any worker delete the cached rows. A serializer that cannot
+        be built fails the startup instead of serving unbatched.
+        """
+        for serializer_class in self.serializers:
+            try:
+                serializer = serializer_class()
+                models = self.get_models(serializer.Meta.model, self.get_tree(serializer))
+            except Exception as e:
+                raise ImproperlyConfigured(f"Fail to load relations of {serializer_class.__name__}. Error: {e}") from e
+
+            if self.enable:
+                for model in models:
+                    self.watch(model)
+
+    def get_models(self, model, tree):
+        models = set()
+        for name, children in tree.items():
+            relation = model._meta.get_field(name)
+            if relation.concrete:
+                models.add(relation.related_model)
+            models.update(self.get_models(relation.related_model, children))
+        return models
+
+    def get_key(self, model, pk):
+        return f"{self.KEY_PREFIX}.{model._meta.label}.{pk}"
+
+    def get_tag(self, model, pk):
+        # Evicted along with the entry, so loads that read the row before
+        # the write do not store it back (see get_many).
+        return f"object.{model._meta.label}.{pk}"
+
+    def get_tree(self, serializer):
+        """
+        Returns the relations the nested serializers of a serializer read,
+        e.g. {'state': {'country': {}}} for CitySerializer.
+        """
+        key = type(serializer)
+        if key not in self.trees:
+            self.trees[key] = self.build_tree(serializer)
+        return self.trees[key]
+
+    def build_tree(self, serializer):
+        model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+        if model is None:
+            return {}
+
+        tree = {}
+        for field in serializer.fields.values():
+            if not isinstance(field, serializers.BaseSerializer) or isinstance(field, serializers.ListSerializer):
+                continue
+            if field.source in ('*', None) or '.' in field.source:
+                continue
+
+            try:
+                relation = model._meta.get_field(field.source)
+            except Exception:
+                continue
+
+            if relation.many_to_one or relation.one_to_one:
+                tree.setdefault(relation.name, {}).update(self.build_tree(field))
+        return tree
+
+    def load_related(self, instances, tree):
+        level = [(list(instances), tree)]
+
+        while level:
+            # Relations of this level grouped by the model they point to,
+            # so e.g. Profile.country and State.country are one batch.
+            batches = defaultdict(list)
+            for objects, subtree in level:
+                if not objects:
+                    continue
+                for name, children in subtree.items():
+                    relation = objects[0]._meta.get_field(name)
+                    batches[relation.related_model].append((relation, objects, children))
+
+            level = []
+            for model, relations in batches.items():
+                level.extend(self.load_batch(model, relations))
+
+    def load_batch(self, model, relations):
+        forward = [item for item in relations if item[0].concrete]
+        reverse = [item for item in relations if not item[0].concrete]
+        loaded = []
+
+        if forward:
+            pks = {
+                getattr(instance, relation.attname)
+                for relation, objects, _ in forward
+                for instance in objects
+                if not relation.is_cached(instance)
+            }
+            pks.discard(None)
+            rows = self.get_many(model, pks)
+
+            for relation, objects, children in forward:
+                related = {}
+                for instance in objects:
+                    pk = getattr(instance, relation.attname)
+                    if pk in rows:
+                        relation.set_cached_value(instance, rows[pk])
+                    if relation.is_cached(instance) and relation.get_cached_value(instance) is not None:
+                        related[pk] = relation.get_cached_value(instance)
+                if children:
+                    loaded.append((list(related.values()), children))
+
+        for relation, objects, children in reverse:
+            field = relation.field
+            pending = [instance for instance in objects if not relation.is_cached(instance)]
+            rows = {}
+            if pending:
+                lookup = {f"{field.name}__in": [instance.pk for instance in pending]}
+                rows = {getattr(row, field.attname): row for row in model._base_manager.filter(**lookup)}
+
+            for instance in pending:
+                row = rows.get(instance.pk)
+                # A cached None makes the accessor raise DoesNotExist, as Django does.
+                relation.set_cached_value(instance, row)
+                if row is not None:
+                    field.set_cached_value(row, instance)
+            if children:
+                # Rows already joined (select_related) are descended into too.
+                related = [relation.get_cached_value(instance) for instance in objects]
+                loaded.append(([row for row in related if row is not None], children))
+
+        return loaded
+
+    def get_many(self, model, pks):
+        """
+        Returns {pk: instance} read from the per-object entries, querying
+        the misses at once and storing them, except those whose row was
+        written while they were read.
+        """
+        if not pks:
+            return {}
+        if not self.enable:
+            return {row.pk: row for row in model._base_manager.filter(pk__in=pks)}
+
+        keys = {self.get_key(model, pk): pk for pk in pks}
+        found = {}
+        try:
+            with self.manager.breaker:
+                found = cache.get_many(list(keys))
+        except CACHE_ERRORS:
+            pass
+
+        rows = {keys[key]: row for key, row in found.items()}
+        self.manager.count(model.__name__, 'object', 'hit' if len(rows) == len(pks) else 'miss')
+
+        missing = pks - rows.keys()
+        if missing:
+            self.watch(model)
+            mark = None
+            try:
+                mark = self.manager.tags.get_mark()
+            except CACHE_ERRORS:
+                pass
+
+            fetched = {row.pk: row for row in model._base_manager.filter(pk__in=missing)}
+            if fetched and mark is not None:
+                self.store(model, fetched, mark)
+            rows.update(fetched)
+        return rows
+
+    def store(self, model, rows, mark):
+        tags = {self.get_tag(model, pk): self.get_key(model, pk) for pk in rows}
+        try:
+            with self.manager.breaker:
+                cache.set_many({self.get_key(model, pk): row for pk, row in rows.items()}, self.timeout)
+
+                stale = self.manager.tags.get_stale(tags, mark)
+                if stale:
+                    # Written while loading; the stored rows may be the old ones.
+                    cache.delete_many([tags[tag] for tag in stale])
+        except CACHE_ERRORS:
+            pass
+
+    def watch(self, model):
+        """
+        Deletes the entries of a model's rows when they are written.
+        """
+        if model in self.watched:
+            return
+
+        with self.lock:
+            if model in self.watched:
+                return
+            post_save.connect(self.watch_change, sender=model,
+                              dispatch_uid=f'batch_loader_save_{model._meta.label}')
+            post_delete.connect(self.watch_change, sender=model,
+                                dispatch_uid=f'batch_loader_delete_{model._meta.label}')
+            self.watched.add(model)
+
+    def watch_change(self, sender, instance, using=None, **kwargs):
+        # Deleted once the write commits, so no reader caches the old row afterwards.
+        self.manager.invalidate((), using or DEFAULT_DB_ALIAS, tags={self.get_tag(sender, instance.pk)},
+                                keys={self.get_key(sender, instance.pk)})
@@ -0,0 +1,80 @@
+import pickle
+import timeit
+
+from collections import OrderedDict
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from apps.utils.cache import CacheEntry
+
+
+class Command(BaseCommand):
+    help = ('Compares the ModelViewSetCached storage formats for a city list page: pickled '
+            'response.data rendered on each hit versus a CacheEntry holding the rendered body')
+
+    def add_arguments(self, parser):
+        parser.add_argument('rows', nargs='*', type=int, default=[20, 100, 5570],
+                            help='Rows per page to measure')
+        parser.add_argument('--number', type=int, default=200,
+                            help='Hits per measurement')
+
+    def handle(self, *args, **options):
+        for rows in options['rows']:
+            self.benchmark(rows, options['number'])
+
+    def build_page(self, rows):
+        results = []
+        for pk in range(1, rows + 1):
+            state = pk % 27 + 1
+            results.append(OrderedDict([
+                ('id', pk),
+                ('name', f'Cidade {pk}'),
+                ('code', f'{3500000 + pk}'),
+                ('state', state),
+                ('state_set', OrderedDict([
+                    ('id', state),
+                    ('name', f'Estado {state}'),
+                    ('code', f'UF{state}'),
+                    ('country', 1),
+                    ('country_set', OrderedDict([
+                        ('id', 1),
+                        ('name', 'Brasil'),
+                        ('code', 'BR'),
+                    ])),
+                ])),
+            ]))
+
+        return OrderedDict([
+            ('count', rows),
+            ('next', None),
+            ('previous', None),
+            ('results', results),
+        ])
+
+    def benchmark(self, rows, number):
+        renderer = JSONRenderer()
+        data = self.build_page(rows)
+
+        stored_data = pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+        entry = CacheEntry.from_content(renderer.render(data, 'application/json'), 'application/json')
+        stored_entry = pickle.dumps(entry, pickle.HIGHEST_PROTOCOL)
+
+        def hit_data():
+            renderer.render(pickle.loads(stored_data), 'application/json')
+
+        def hit_entry():
+            pickle.loads(stored_entry).get_content('gzip, deflate')
+
+        def hit_entry_identity():
+            pickle.loads(stored_entry).get_content('')
+
+        self.stdout.write(f'rows={rows}')
+        self.stdout.write(f'  stored bytes   data={len(stored_data):>10}  entry={len(stored_entry):>10}'
+                          f'  ({len(stored_entry) / len(stored_data):.1%})')
+
+        for name, func in (('data', hit_data),
+                           ('entry (gzip client)', hit_entry),
+                           ('entry (identity client)', hit_entry_identity)):
+            seconds = min(timeit.repeat(func, number=number, repeat=3)) / number
+            self.stdout.write(f'  hit latency    {name:<24} {seconds * 1e6:>10.1f} us')
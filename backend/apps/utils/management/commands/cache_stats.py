@@ -0,0 +1,102 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from apps.utils.cache import CacheManager
+
+
+class Command(BaseCommand):
+    help = 'Shows cache hit ratios, latencies and sizes collected from every worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prometheus', action='store_true',
+                            help='Print the raw Prometheus text exposition')
+        parser.add_argument('--reset', action='store_true',
+                            help='Reset the collected metrics after printing them')
+
+    def handle(self, *args, **options):
+        metrics = CacheManager().metrics
+
+        if options['prometheus']:
+            self.stdout.write(metrics.render())
+        else:
+            self.print_summary(metrics)
+
+        if options['reset']:
+            metrics.reset()
+            self.stdout.write(self.style.SUCCESS('Cache metrics reset'))
+
+    def print_summary(self, metrics):
+        operations = defaultdict(float)
+        histograms = defaultdict(lambda: defaultdict(float))
+        totals = defaultdict(float)
+
+        for sample, value in metrics.collect().items():
+            name, labels = metrics.parse_sample(sample)
+            model = labels.get('model', '*')
+
+            if name == 'followme_cache_operations_total':
+                operations[(model, labels['operation'], labels['result'])] += value
+            elif name == 'followme_cache_operation_seconds_bucket':
+                series = (model, labels['operation'], labels.get('result', ''))
+                histograms[series][labels['le']] += value
+            elif name == 'followme_cache_stored_bytes_total':
+                totals[(model, 'bytes')] += value
+            elif name == 'followme_cache_invalidated_keys_sum':
+                totals[(model, 'invalidated')] += value
+            elif name == 'followme_cache_breaker_transitions_total':
+                totals[('*', f"breaker_{labels['state']}")] += value
+
+        models = sorted({model for model, *_ in operations} |
+                        {model for model, *_ in histograms} |
+                        {model for model, total in totals if not total.startswith('breaker_')})
+
+        self.stdout.write(f"{'model':<20}{'l1 hit':>8}{'l2 hit':>8}{'stale':>8}{'bypass':>8}"
+                          f"{'stored':>12}{'evicted':>9}")
+        for model in models:
+            l1 = self.get_ratio(operations, model, 'l1')
+            l2 = self.get_ratio(operations, model, 'l2')
+            self.stdout.write(f"{model:<20}{l1:>8}{l2:>8}"
+                              f"{int(operations[(model, 'get', 'stale')]):>8}"
+                              f"{int(operations[(model, 'get', 'bypass')]):>8}"
+                              f"{self.get_size(totals[(model, 'bytes')]):>12}"
+                              f"{int(totals[(model, 'invalidated')]):>9}")
+
+        self.stdout.write('')
+        self.stdout.write(f"circuit breaker opened {int(totals[('*', 'breaker_open')])} times, "
+                          f"closed {int(totals[('*', 'breaker_closed')])} times")
+
+        self.stdout.write('')
+        self.stdout.write(f"{'model':<20}{'operation':<12}{'result':<8}{'count':>9}{'p50':>10}{'p95':>10}")
+        for (model, operation, result), buckets in sorted(histograms.items()):
+            count = buckets.get('+Inf', 0)
+            self.stdout.write(f"{model:<20}{operation:<12}{result:<8}{int(count):>9}"
+                              f"{self.get_quantile(buckets, 0.5):>10}"
+                              f"{self.get_quantile(buckets, 0.95):>10}")
+
+    def get_ratio(self, operations, model, tier):
+        hit = operations[(model, 'get', f'{tier}_hit')]
+        total = hit + operations[(model, 'get', f'{tier}_miss')]
+        return f'{hit / total:.0%}' if total else '-'
+
+    def get_size(self, value):
+        for unit in ('B', 'KB', 'MB', 'GB'):
+            if value < 1024:
+                return f'{value:.0f}{unit}'
+            value /= 1024
+        return f'{value:.0f}TB'
+
+    def get_quantile(self, buckets, quantile):
+        """
+        Upper bound of the first bucket holding the quantile, as Prometheus
+        histogram_quantile would approximate it.
+        """
+        count = buckets.get('+Inf', 0)
+        if not count:
+            return '-'
+
+        for le, value in sorted(((float(le), value) for le, value in buckets.items()),
+                                key=lambda item: item[0]):
+            if value >= count * quantile:
+                return f'<{le * 1000:g}ms' if le != float('inf') else '>2.5s'
+        return '-'
@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.utils.cache import CACHE_ENABLE
+from apps.utils.warmup import CacheWarmer
+
+
+class Command(BaseCommand):
+    help = 'Replays the common reference data requests to fill the cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Email of the user to warm the cache as (default: first superuser)')
+        parser.add_argument('--workers', type=int, help='Concurrent requests (default: BACKEND_CACHE_WARM_WORKERS)')
+        parser.add_argument('--retrieve-limit', type=int,
+                            help='Rows retrieved per viewset (default: BACKEND_CACHE_WARM_RETRIEVE_LIMIT)')
+        parser.add_argument('--domain', help='Scheme and host of the requests (default: BACKEND_DOMAIN)')
+
+    def handle(self, *args, **options):
+        if not CACHE_ENABLE:
+            raise CommandError('The cache is disabled (BACKEND_CACHE_ENABLE)')
+
+        user = None
+        if options['user']:
+            user = get_user_model().objects.filter(email=options['user']).first()
+            if user is None:
+                raise CommandError(f"User {options['user']} not found")
+
+        warmer = CacheWarmer(user=user, workers=options['workers'],
+                             retrieve_limit=options['retrieve_limit'], domain=options['domain'])
+        self.verbosity = options['verbosity']
+
+        summary = warmer.run(progress=self.print_progress)
+        if not summary['requests']:
+            self.stdout.write(self.style.WARNING('Nothing to warm, see the log for why'))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Warmed {summary['requests']} requests in {summary['seconds']:.1f}s "
+            f"with {warmer.workers} workers"))
+        for status, count in sorted(summary['statuses'].items(), key=str):
+            self.stdout.write(f"  {status}: {count}")
+        for seconds, path, params in summary['slowest']:
+            self.stdout.write(f"  slowest {seconds * 1000:>8.1f}ms {path} {params or ''}")
+
+    def print_progress(self, done, total, request, status, seconds):
+        _, action, path, params, _ = request
+        if self.verbosity > 1 or status != 200:
+            self.stdout.write(f"[{done}/{total}] {status} {seconds * 1000:>8.1f}ms {path} {params or ''}")
+        elif done % 100 == 0 or done == total:
+            self.stdout.write(f"[{done}/{total}]")
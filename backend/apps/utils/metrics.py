@@ -0,0 +1,188 @@
+import time
+import atexit
+import logging
+import threading
+import environ
+
+from collections import defaultdict
+from contextlib import nullcontext
+
+from django.core.cache import cache
+from django_redis import get_redis_connection
+
+from .breaker import CACHE_ERRORS, CacheUnavailable
+
+env = environ.Env()
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+KEYS_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000)
+AGE_BUCKETS = (1, 10, 60, 300, 900, 3600, 21600, 86400)
+
+class CacheMetrics:
+    """
+    Prometheus style counters and histograms for the cache.
+
+    Each worker accumulates increments in memory and adds them every
+    BACKEND_CACHE_METRICS_FLUSH seconds to one Redis hash, so the endpoint
+    and the cache_stats command report totals of every worker and node.
+    Samples are stored under their exposition name, e.g.
+    followme_cache_operations_total{model="City",operation="get",result="miss"}.
+    """
+    HASH_KEY = 'followme.cache.metrics'
+
+    TYPES = {
+        'followme_cache_operations_total': 'counter',
+        'followme_cache_operation_seconds': 'histogram',
+        'followme_cache_stored_bytes_total': 'counter',
+        'followme_cache_invalidated_keys': 'histogram',
+        'followme_cache_stale_seconds': 'histogram',
+        'followme_cache_breaker_transitions_total': 'counter',
+    }
+
+    def __init__(self, breaker=None):
+        self.pending = defaultdict(float)
+        self.gauges = {}
+        self.breaker = breaker
+        self.lock = threading.Lock()
+        self.interval = env.int("BACKEND_CACHE_METRICS_FLUSH", default=10)
+        self.next_flush = time.monotonic() + self.interval
+        atexit.register(self.flush)
+
+    def get_sample(self, name, labels, **extra):
+        labels = dict(labels, **extra)
+        if not labels:
+            return name
+        text = ','.join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+        return f'{name}{{{text}}}'
+
+    def parse_sample(self, sample):
+        """
+        Splits a sample name into its metric name and labels.
+        """
+        if '{' not in sample:
+            return sample, {}
+        name, text = sample[:-1].split('{', 1)
+        labels = {}
+        for item in text.split('",'):
+            key, value = item.split('="', 1)
+            labels[key] = value.rstrip('"')
+        return name, labels
+
+    def inc(self, name, labels, value=1):
+        with self.lock:
+            self.pending[self.get_sample(name, labels)] += value
+        self.flush_if_due()
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        with self.lock:
+            for bucket in buckets:
+                if value <= bucket:
+                    self.pending[self.get_sample(f'{name}_bucket', labels, le=bucket)] += 1
+            self.pending[self.get_sample(f'{name}_bucket', labels, le='+Inf')] += 1
+            self.pending[self.get_sample(f'{name}_sum', labels)] += value
+            self.pending[self.get_sample(f'{name}_count', labels)] += 1
+        self.flush_if_due()
+
+    def gauge(self, name, func):
+        """
+        Registers a gauge of this worker, read by func when rendering.
+        """
+        self.gauges[name] = func
+
+    def timer(self, operation, model, **labels):
+        return MetricsTimer(self, dict(labels, operation=operation, model=model))
+
+    def flush_if_due(self):
+        if time.monotonic() >= self.next_flush:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, defaultdict(float)
+            self.next_flush = time.monotonic() + self.interval
+
+        if not pending:
+            return
+
+        try:
+            with self.guard():
+                client = get_redis_connection('default')
+                with client.pipeline(transaction=False) as pipe:
+                    for sample, value in pending.items():
+                        pipe.hincrbyfloat(cache.make_key(self.HASH_KEY), sample, value)
+                    pipe.execute()
+        except Exception as e:
+            if not isinstance(e, CacheUnavailable):
+                logging.error(f"Fail to flush cache metrics. Error: {e}")
+            # Kept for the next flush, so an outage does not lose them.
+            with self.lock:
+                for sample, value in pending.items():
+                    self.pending[sample] += value
+
+    def guard(self):
+        return self.breaker if self.breaker is not None else nullcontext()
+
+    def collect(self):
+        """
+        Returns every sample of all workers, this worker's unflushed
+        increments included. Only this worker's samples are returned while
+        Redis is unreachable.
+        """
+        self.flush()
+        try:
+            with self.guard():
+                values = get_redis_connection('default').hgetall(cache.make_key(self.HASH_KEY))
+        except CACHE_ERRORS:
+            with self.lock:
+                return dict(self.pending)
+        return {sample.decode(): float(value) for sample, value in values.items()}
+
+    def reset(self):
+        with self.lock:
+            self.pending.clear()
+        get_redis_connection('default').delete(cache.make_key(self.HASH_KEY))
+
+    def get_sort_key(self, item):
+        # Buckets of a series sorted by their numeric bound, +Inf last.
+        name, labels = self.parse_sample(item[0])
+        le = float(labels.pop('le', 'inf'))
+        return (name.rsplit('_bucket', 1)[0], sorted(labels.items()), name, le)
+
+    def render(self):
+        """
+        Returns the collected samples in the Prometheus text format.
+        """
+        families = defaultdict(list)
+        for sample, value in sorted(self.collect().items(), key=self.get_sort_key):
+            name = sample.split('{', 1)[0]
+            for suffix in ('_bucket', '_sum', '_count'):
+                if name.endswith(suffix) and name[:-len(suffix)] in self.TYPES:
+                    name = name[:-len(suffix)]
+            families[name].append(f'{sample} {value:g}')
+
+        lines = []
+        for name, samples in families.items():
+            lines.append(f'# TYPE {name} {self.TYPES.get(name, "untyped")}')
+            lines.extend(samples)
+
+        for name, func in sorted(self.gauges.items()):
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {func():g}')
+        return '\n'.join(lines) + '\n'
+
+class MetricsTimer:
+    """
+    Context manager observing the elapsed time of a cache operation.
+    """
+    def __init__(self, metrics, labels):
+        self.metrics = metrics
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe('followme_cache_operation_seconds', self.labels,
+                             time.perf_counter() - self.start)
+        return False
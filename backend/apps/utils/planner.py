@@ -0,0 +1,205 @@
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+from .serializers import BatchLoaderMixin
+
+class QueryPlan:
+    """
+    The select_related, prefetch_related and only() arguments a serializer
+    needs, applied to the queryset it is given.
+    """
+    def __init__(self):
+        self.select_related = []
+        self.prefetch_related = []
+        self.only = set()
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        if self.only:
+            queryset = queryset.only(*sorted(self.only))
+        return queryset
+
+class QueryPlanner:
+    """
+    Derives the QueryPlan of a serializer from its nested serializers:
+
+      - one-to-one and foreign key relations are joined (select_related),
+        those of dotted sources such as 'user.email' too,
+      - many relations are prefetched, with the plan of their serializer,
+      - only the columns the fields read are loaded (only()).
+
+    A serializer reading a property or a method field may touch any column
+    of its row, or of the rows it is nested in, so only() is left out
+    then. BatchLoaderMixin serializers already resolve their foreign keys
+    from the object cache of BatchLoader, so those are not joined.
+    """
+    def __init__(self):
+        self.plans = {}
+        self.viewsets = []
+
+    def register(self, viewset):
+        self.viewsets.append(viewset)
+
+    def freeze(self):
+        """
+        Plans, at startup, the serializer of every registered viewset. A
+        serializer that cannot be planned fails the startup instead of
+        serving unplanned.
+        """
+        for viewset in self.viewsets:
+            serializer_class = getattr(viewset, 'serializer_class', None)
+            if serializer_class is None:
+                continue
+            try:
+                self.get_plan(serializer_class)
+            except Exception as e:
+                raise ImproperlyConfigured(f"Fail to plan queries of {serializer_class.__name__}. Error: {e}") from e
+
+    def get_plan(self, serializer_class):
+        plan = self.plans.get(serializer_class)
+        if plan is None:
+            plan = self.plans[serializer_class] = self.build_plan(serializer_class())
+        return plan
+
+    def build_plan(self, serializer):
+        plan = QueryPlan()
+        columns, complete = self.plan_fields(serializer, serializer.Meta.model, '', plan,
+                                             isinstance(serializer, BatchLoaderMixin))
+        # Loaded whole unless every level only reads its own columns.
+        if complete:
+            plan.only.update(columns)
+        return plan
+
+    def plan_fields(self, serializer, model, prefix, plan, batched, parent=None):
+        """
+        Adds the relations a serializer reads to the plan. Returns the
+        columns it reads and whether they are all it can read. parent is
+        the relation the rows are joined through, if any.
+        """
+        columns = {model._meta.pk.name}
+        joined = set()
+        complete = True
+
+        for field in serializer.fields.values():
+            if field.write_only:
+                continue
+            if field.source == '*':
+                complete = False
+                continue
+            if '.' in field.source:
+                read = self.plan_source(field.source, model, prefix, plan, parent)
+                if read is None:
+                    complete = False
+                else:
+                    joined.update(read)
+                continue
+
+            try:
+                relation = model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                # A property or a method, which may read any column.
+                complete = False
+                continue
+
+            if relation.many_to_many or relation.one_to_many:
+                self.plan_prefetch(field, relation, prefix, plan)
+                continue
+
+            if relation.concrete:
+                columns.add(relation.name)
+
+            if not isinstance(field, serializers.BaseSerializer):
+                continue
+            if batched and relation.concrete:
+                continue
+
+            path = prefix + field.source
+            plan.select_related.append(path)
+            nested, nested_complete = self.plan_fields(field, relation.related_model, f"{path}__", plan, batched,
+                                                       relation)
+            joined.update(nested)
+            if not relation.concrete:
+                joined.add(f"{path}__{relation.field.name}")
+            complete = complete and nested_complete
+
+        return {prefix + column for column in columns} | joined, complete
+
+    def plan_source(self, source, model, prefix, plan, parent=None):
+        """
+        Joins the relations a dotted source such as 'user.email' follows.
+        Returns the columns it reads, or None when it may read any: a
+        property or a many relation is on the way, or it goes back through
+        parent, whose row Django already set and which is not joined again.
+        """
+        *names, attr = source.split('.')
+        columns = set()
+        path = prefix
+
+        for name in names:
+            try:
+                relation = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                return None
+            if not (relation.many_to_one or relation.one_to_one):
+                return None
+            if parent is not None and relation.remote_field is parent:
+                return None
+            parent = relation
+
+            if relation.concrete:
+                columns.add(path + relation.name)
+            path += relation.name
+            if path not in plan.select_related:
+                plan.select_related.append(path)
+            if not relation.concrete:
+                columns.add(f"{path}__{relation.field.name}")
+            path += '__'
+            model = relation.related_model
+
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+        if not field.concrete:
+            return None
+        columns.add(path + field.name)
+        return columns
+
+    def plan_prefetch(self, field, relation, prefix, plan):
+        child = getattr(field, 'child', None)
+        if not isinstance(child, serializers.BaseSerializer):
+            plan.prefetch_related.append(prefix + field.source)
+            return
+
+        child_plan = self.build_plan(child)
+        if child_plan.only and relation.one_to_many:
+            # The rows are matched to their parent through the foreign key.
+            child_plan.only.add(relation.field.name)
+        queryset = child_plan.apply(relation.related_model._default_manager.all())
+        plan.prefetch_related.append(Prefetch(prefix + field.source, queryset=queryset))
+
+planner = QueryPlanner()
+
+class QueryPlanMixin:
+    """
+    Viewset mixin applying the QueryPlan of the action's serializer to the
+    list and retrieve querysets, so they run a constant number of queries
+    whatever the page size. It hooks filter_queryset, which both actions
+    call on the result of get_queryset, so viewsets overriding get_queryset
+    are planned too.
+    """
+    query_plan_actions = ('list', 'retrieve')
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        planner.register(cls)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if getattr(self, 'action', None) in self.query_plan_actions:
+            queryset = planner.get_plan(self.get_serializer_class()).apply(queryset)
+        return queryset
@@ -0,0 +1,59 @@
+from django.db import models
+from rest_framework import serializers
+
+from .cache import CACHE_ENABLE, CacheManager
+
+class BatchLoaderListSerializer(serializers.ListSerializer):
+    """
+    Loads the related rows the nested serializers of a page read in a few
+    batches before the rows are serialized one by one. Children setting
+    cache_fragment are assembled from per-row fragments instead.
+    """
+    def to_representation(self, data):
+        instances = list(data.all() if isinstance(data, models.Manager) else data)
+        if not instances:
+            return []
+
+        manager = CacheManager()
+        if CACHE_ENABLE and getattr(self.child, 'cache_fragment', False):
+            view = self.context.get('view')
+            return manager.fragments.to_representation(self.child, instances,
+                                                       getattr(view, 'cache_fragment_tags', None))
+
+        manager.loader.load_related(instances, manager.loader.get_tree(self.child))
+        return super().to_representation(instances)
+
+class BatchLoaderMixin:
+    """
+    Serializer mixin batching the nested foreign keys it reads, both when
+    it is listed (many=True) and for a single top level instance.
+
+    Setting cache_fragment = True caches the representation of each listed
+    row; it must then depend on the row and the rows it embeds only, not
+    on the request.
+    """
+    cache_fragment = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if getattr(cls, 'Meta', None) is not None:
+            CacheManager().loader.register(cls)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        allow_empty = kwargs.pop('allow_empty', None)
+        list_kwargs = {'child': cls(*args, **kwargs)}
+        if allow_empty is not None:
+            list_kwargs['allow_empty'] = allow_empty
+        list_kwargs.update({
+            key: value for key, value in kwargs.items()
+            if key in serializers.LIST_SERIALIZER_KWARGS
+        })
+        list_serializer_class = getattr(cls.Meta, 'list_serializer_class', BatchLoaderListSerializer)
+        return list_serializer_class(*args, **list_kwargs)
+
+    def to_representation(self, instance):
+        if self.parent is None:
+            loader = CacheManager().loader
+            loader.load_related([instance], loader.get_tree(self))
+        return super().to_representation(instance)
@@ -0,0 +1,78 @@
+import bisect
+import xxhash
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+
+class ShardRing:
+    """
+    Consistent hash ring placing accounts on the Redis nodes configured as
+    cache aliases: 'default' and every 'shard*' alias (BACKEND_REDIS_SHARDS).
+
+    Every key of an account (its cached responses, locks and generation
+    counters, 'followme.cache.<account>.…' and
+    'followme.generation.<account>.…') lives on the account's node, so an
+    account invalidation is a single INCR on one node. Shared data (model
+    wide '*' generations, tags, memoized results, metrics) stays on
+    'default'.
+
+    Each node owns REPLICAS points of the ring, hashed from its location,
+    so adding a node only moves the accounts landing on its points (about
+    1/N of them) and reordering the settings moves none.
+    """
+    REPLICAS = 160
+    ACCOUNT_KEYS = ('cache', 'generation')
+
+    def __init__(self):
+        points = []
+        for alias, config in settings.CACHES.items():
+            if alias != 'default' and not alias.startswith('shard'):
+                continue
+            location = config.get('LOCATION', alias)
+            for replica in range(self.REPLICAS):
+                points.append((xxhash.xxh64_intdigest(f"{location}#{replica}"), alias))
+
+        points.sort()
+        self.hashes = [point for point, _ in points]
+        self.aliases = [alias for _, alias in points]
+        self.sharded = len(set(self.aliases)) > 1
+
+    def get_alias(self, account):
+        if not self.sharded or account in (None, '*'):
+            return 'default'
+        index = bisect.bisect(self.hashes, xxhash.xxh64_intdigest(str(account))) % len(self.hashes)
+        return self.aliases[index]
+
+    def get_account(self, key):
+        # followme.cache.{account}.… and followme.generation.{account}.…
+        parts = key.split('.', 3)
+        if len(parts) > 2 and parts[0] == 'followme' and parts[1] in self.ACCOUNT_KEYS:
+            return parts[2]
+        return None
+
+    def get_cache(self, key):
+        """
+        Returns the cache holding a key.
+        """
+        return caches[self.get_alias(self.get_account(key))]
+
+    def group(self, keys):
+        """
+        Returns {cache alias: keys} for keys spread over several nodes.
+        """
+        groups = defaultdict(list)
+        for key in keys:
+            groups[self.get_alias(self.get_account(key))].append(key)
+        return groups
+
+    def get_many(self, keys):
+        values = {}
+        for alias, group in self.group(keys).items():
+            values.update(caches[alias].get_many(group))
+        return values
+
+    def delete_many(self, keys):
+        for alias, group in self.group(keys).items():
+            caches[alias].delete_many(group)
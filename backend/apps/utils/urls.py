@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import CacheMetricsView
+
+app_name = 'utils'
+
+urlpatterns = [
+    path('cache/metrics/', CacheMetricsView.as_view(), name='cache-metrics'),
+]
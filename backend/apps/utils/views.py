@@ -0,0 +1,15 @@
+from django.http import HttpResponse
+from rest_framework.views import APIView
+from rest_framework.permissions import IsAdminUser
+
+from .cache import CacheManager
+
+class CacheMetricsView(APIView):
+    """
+    Cache metrics of every worker in the Prometheus text format.
+    """
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, format=None):
+        return HttpResponse(CacheManager().metrics.render(),
+                            content_type='text/plain; version=0.0.4; charset=utf-8')
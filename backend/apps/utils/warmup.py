@@ -0,0 +1,168 @@
+import os
+import time
+import logging
+import threading
+import environ
+
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.db import connections
+from django.urls import get_resolver, reverse, URLPattern, URLResolver
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .cache import CACHE_ENABLE, CacheManager
+from .breaker import CACHE_ERRORS
+
+env = environ.Env()
+
+class CacheWarmer:
+    """
+    Replays the common GET requests of the viewsets setting cache_warm
+    through their real code, so the first users after a deploy or a Redis
+    flush hit a warm cache:
+
+      - the unfiltered list,
+      - the list filtered by every value of each cache_warm_filters param
+        (e.g. every state's city list with state=<id>),
+      - the retrieve of up to retrieve_limit rows.
+
+    Requests run as the given user, so they fill the entries of the
+    user's account, on a pool of at most `workers` threads. Viewsets with a
+    cache_scope are skipped: their entries are per permission profile or
+    user, and one user's would only serve users like them.
+    """
+    def __init__(self, user=None, workers=None, retrieve_limit=None, domain=None):
+        self.user = user or get_user_model().objects.filter(is_superuser=True, is_active=True).order_by('pk').first()
+        self.workers = workers or env.int("BACKEND_CACHE_WARM_WORKERS", default=4)
+        self.retrieve_limit = env.int("BACKEND_CACHE_WARM_RETRIEVE_LIMIT", default=1000) if retrieve_limit is None else retrieve_limit
+        # Pagination links are cached with the host of the request.
+        domain = urlsplit(domain or env.str("BACKEND_DOMAIN", default="http://localhost:8000"))
+        self.extra = {
+            'SERVER_NAME': domain.hostname or 'localhost',
+            'SERVER_PORT': str(domain.port or (443 if domain.scheme == 'https' else 80)),
+            'wsgi.url_scheme': domain.scheme or 'http',
+        }
+        self.factory = APIRequestFactory()
+
+    def get_routes(self, resolver=None, namespace=''):
+        """
+        Returns {viewset: {action: url name}} for the routed GET actions.
+        """
+        routes = {}
+        for pattern in (resolver or get_resolver()).url_patterns:
+            if isinstance(pattern, URLResolver):
+                prefix = f"{namespace}{pattern.namespace}:" if pattern.namespace else namespace
+                for viewset, actions in self.get_routes(pattern, prefix).items():
+                    routes.setdefault(viewset, {}).update(actions)
+            elif isinstance(pattern, URLPattern) and pattern.name:
+                viewset = getattr(pattern.callback, 'cls', None)
+                action = getattr(pattern.callback, 'actions', {}).get('get')
+                if viewset is not None and action in ('list', 'retrieve'):
+                    routes.setdefault(viewset, {}).setdefault(action, f"{namespace}{pattern.name}")
+        return routes
+
+    def get_requests(self):
+        """
+        Returns the (viewset, action, path, params, pk) requests to replay.
+        """
+        requests = []
+        for viewset, actions in self.get_routes().items():
+            if not getattr(viewset, 'cache_warm', False):
+                continue
+            if getattr(viewset, 'cache_scope', None) is not None:
+                logging.warning(f"[CACHE]: not warming {viewset.__name__}, its entries are per {viewset.cache_scope}")
+                continue
+
+            queryset = viewset().get_queryset()
+
+            if 'list' in actions:
+                path = reverse(actions['list'])
+                requests.append((viewset, 'list', path, {}, None))
+                for param in getattr(viewset, 'cache_warm_filters', ()):
+                    for value in queryset.order_by().values_list(param, flat=True).distinct():
+                        if value is not None:
+                            requests.append((viewset, 'list', path, {param: value}, None))
+
+            if 'retrieve' in actions and self.retrieve_limit:
+                for pk in queryset.values_list('pk', flat=True)[:self.retrieve_limit]:
+                    requests.append((viewset, 'retrieve', reverse(actions['retrieve'], kwargs={'pk': pk}), {}, pk))
+        return requests
+
+    def replay(self, viewset, action, path, params, pk=None):
+        request = self.factory.get(path, params, **self.extra)
+        force_authenticate(request, user=self.user)
+        view = viewset.as_view({'get': action})
+
+        start = time.perf_counter()
+        try:
+            response = view(request, pk=pk) if pk is not None else view(request)
+            return response.status_code, time.perf_counter() - start
+        finally:
+            connections.close_all()
+
+    def run(self, progress=None):
+        """
+        Replays every request and returns a summary. progress, if given, is
+        called with (done, total, request, status, seconds) as they finish.
+        """
+        start = time.perf_counter()
+        requests = self.get_requests() if self.user is not None else []
+        statuses = {}
+        slowest = []
+
+        if self.user is None:
+            logging.warning("[CACHE]: nothing warmed, no active superuser to warm the cache as")
+        elif not requests:
+            logging.warning("[CACHE]: nothing warmed, no routed viewset sets cache_warm without a cache_scope")
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='cache-warm') as pool:
+            futures = {pool.submit(self.replay, *request): request for request in requests}
+            for done, future in enumerate(as_completed(futures), 1):
+                request = futures[future]
+                try:
+                    status, seconds = future.result()
+                except Exception as e:
+                    logging.error(f"Fail to warm {request[2]} {request[3]}. Error: {e}")
+                    status, seconds = 'error', 0.0
+
+                statuses[status] = statuses.get(status, 0) + 1
+                slowest = sorted(slowest + [(seconds, request[2], request[3])], reverse=True)[:5]
+                if progress is not None:
+                    progress(done, len(requests), request, status, seconds)
+
+        return {
+            'requests': len(requests),
+            'statuses': statuses,
+            'seconds': time.perf_counter() - start,
+            'slowest': slowest,
+        }
+
+def warm_on_boot():
+    """
+    Warms the cache in the background when a worker boots, if
+    BACKEND_CACHE_WARM_ON_BOOT is set. Only the first worker within
+    BACKEND_CACHE_WARM_INTERVAL seconds does it, so a deploy with many
+    workers warms once.
+    """
+    if not CACHE_ENABLE or not env.bool("BACKEND_CACHE_WARM_ON_BOOT", default=False):
+        return
+
+    try:
+        with CacheManager().breaker:
+            acquired = cache.add('followme.warm.boot', os.getpid(), env.int("BACKEND_CACHE_WARM_INTERVAL", default=600))
+    except CACHE_ERRORS as e:
+        logging.error(f"Fail to schedule cache warming. Error: {e}")
+        return
+
+    if acquired:
+        threading.Thread(target=run_boot_warmer, name='cache-warm-boot', daemon=True).start()
+
+def run_boot_warmer():
+    try:
+        summary = CacheWarmer().run()
+        logging.warning(f"[CACHE]: warmed {summary['requests']} requests in {summary['seconds']:.1f}s {summary['statuses']}")
+    except Exception as e:
+        logging.error(f"Fail to warm the cache. Error: {e}")
@@ -25,6 +25,7 @@ DJANGO_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 THIRD_PARTY_APPS = [
@@ -47,6 +48,7 @@ LOCAL_APPS = [
     'apps.accounts',
     'apps.address',
     'apps.permission',
+    'apps.utils',
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
@@ -136,10 +138,21 @@ CACHES = {
         'LOCATION': f'redis://{env.str("BACKEND_REDIS_HOST", default="localhost")}:{env.str("BACKEND_REDIS_PORT", default="6379")}/1',
         'OPTIONS': {
             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            # Timeouts curtos: com o Redis fora do ar o circuit breaker abre e a API segue pelo banco
+            'SOCKET_CONNECT_TIMEOUT': env.float("BACKEND_REDIS_CONNECT_TIMEOUT", default=0.5),
+            'SOCKET_TIMEOUT': env.float("BACKEND_REDIS_TIMEOUT", default=0.5),
         }
     }
 }
 
+# Nós Redis adicionais (BACKEND_REDIS_SHARDS="redis://host:6379/1,..."): os dados em cache
+# de cada conta ficam em um único nó, escolhido por consistent hashing da conta
+for index, location in enumerate(env.list("BACKEND_REDIS_SHARDS", default=[])):
+    CACHES[f'shard{index}'] = dict(CACHES['default'], LOCATION=location)
+
+# Importações do admin em uma única transação (invalidação de cache agrupada no commit)
+IMPORT_EXPORT_USE_TRANSACTIONS = True
+
 # Configurações do Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
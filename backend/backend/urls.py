@@ -38,6 +38,7 @@ apps_url = [
     path('api/v1/accounts/', include('apps.accounts.urls')),
     path('api/v1/permission/', include('apps.permission.urls')),
     path('api/v1/address/', include('apps.address.urls')),
+    path('api/v1/utils/', include('apps.utils.urls')),
 ]
 
 urlpatterns = system_url + apps_url + \
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# Optional warm-up of the cache once per deploy (BACKEND_CACHE_WARM_ON_BOOT)
+from apps.utils.warmup import warm_on_boot  # noqa: E402
+warm_on_boot()